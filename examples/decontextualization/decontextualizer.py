@@ -1,53 +1,74 @@
-from typing import List, Dict, Type
+from typing import List, Dict, Type, Optional, Mapping, Any, ClassVar
+from types import MappingProxyType
+import asyncio
+import logging
 
 from src.got.node import LLMConfig
 from src.got.thought import Thought
 from src.got.generator import GoTGenerator
+from .semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
+
+_SENTENCE_SCHEMA = MappingProxyType({
+    "type": "object",
+    "required": ["sentence", "context"],
+    "properties": {
+        "sentence": {"type": "string"},
+        "context": {"type": "string"}
+    }
+})
 
 
 class SentenceThought(Thought):
-    @property
-    def schema(self) -> dict:
-        return {
-            "type": "object",
-            "required": ["sentence", "context"],
-            "properties": {
-                "sentence": {"type": "string"},
-                "context": {"type": "string"}
-            }
-        }
-
-    def get_for_template(self, key: str) -> str:
-        match key:
-            case "sentence":
-                return str(self._values["sentence"])
-            case "context":
-                return str(self._values["context"])
-            case _:
-                raise KeyError(f"Campo '{key}' non valido per SentenceThought")
+    __slots__ = ("_context_hash",)
+
+    _GETTERS = {
+        "sentence": lambda values: str(values["sentence"]),
+        "context": lambda values: str(values["context"]),
+    }
+
+    schema: ClassVar[Mapping[str, Any]] = _SENTENCE_SCHEMA
+
+
+_DECONTEXTUALIZED_SCHEMA = MappingProxyType({
+    "type": "object",
+    "required": ["in_context_sentence", "standalone_sentence"],
+    "properties": {
+        "in_context_sentence": {"type": "string"},
+        "standalone_sentence": {"type": "string"}
+    }
+})
 
 
 class DecontextualizedThought(Thought):
-    @property
-    def schema(self) -> dict:
-        return {
-            "type": "object",
-            "required": ["in_context_sentence", "standalone_sentence"],
-            "properties": {
-                "in_context_sentence": {"type": "string"},
-                "standalone_sentence": {"type": "string"}
-            }
-        }
-        def get_for_template(self, key: str) -> str:
-            match key:
-                case "in_context_sentence":
-                    return str(self._values["in_context_sentence"])
-                case "standalone_sentence":
-                    return str(self._values["standalone_sentence"])
-                case _:
-                    raise KeyError(f"Campo '{key}' non valido per SentenceThought")
+    __slots__ = ()
+
+    _GETTERS = {
+        "in_context_sentence": lambda values: str(values["in_context_sentence"]),
+        "standalone_sentence": lambda values: str(values["standalone_sentence"]),
+    }
+
+    schema: ClassVar[Mapping[str, Any]] = _DECONTEXTUALIZED_SCHEMA
 
 class Decontextualizer(GoTGenerator):
+    # I tentativi falliti (es. limiti di richieste del server) vengono ripetuti
+    # dopo 2, 4, ... secondi invece che immediatamente
+    RETRY_BACKOFF = 2.0
+
+    def __init__(self, node_id: str, llm_config: LLMConfig, cache: Optional[SemanticCache] = None):
+        """
+        Inizializza il Decontextualizer.
+
+        Args:
+            node_id: Identificatore univoco del nodo
+            llm_config: Configurazione del modello LLM
+            cache: Cache semantica opzionale condivisa tra più invocazioni
+        """
+        super().__init__(node_id, llm_config)
+        self.cache = cache
+
     @property
     def mapping(self) -> Dict[str, Type[Thought]]:
         return {"input" : SentenceThought}
@@ -60,21 +81,74 @@ class Decontextualizer(GoTGenerator):
     def output_cardinality(self) -> int:
         return 1
 
-    @property
-    def task_instruction(self) -> str:
-        return """
+    _TASK_INSTRUCTION = """
         Your task is to take the provided sentence and its surrounding context, and rewrite the sentence
         in a way that makes it self-contained and interpretable without the original context.
 
-        Original sentence: {input.sentence}
-        Context: {input.context}
-
         The goal is to preserve the meaning while adding necessary clarifying details:
         - Replace pronouns with relevant names/roles
         - Add contextual information (location, time, profession)
         - Modify minimally, only to decontextualize
         Do not summarize or paraphrase. Maintain the original meaning.
+
+        Original sentence: {input.sentence}
+        Context: {input.context}
+        """
+
+    @property
+    def task_instruction(self) -> str:
+        return self._TASK_INSTRUCTION
+
+    def process(self, inputs: Dict[str, Thought]) -> None:
+        """
+        Decontestualizza la frase, riusando il risultato di una frase
+        semanticamente equivalente se presente nella cache. Se la cache non è
+        utilizzabile (es. modello di embedding non disponibile) la frase viene
+        decontestualizzata senza cache.
+
+        Raises:
+            ValueError: Se gli input non sono validi o se la generazione fallisce
         """
+        if self.cache is None:
+            super().process(inputs)
+            return
+
+        try:
+            self._validate_inputs(inputs)
+        except Exception as e:
+            self.set_error(f"Errore nel nodo {self.node_id}: {str(e)}")
+            raise
+
+        sentence = inputs["input"]
+        text = sentence.values["sentence"]
+        context = sentence.values["context"]
+        context_hash = getattr(sentence, "_context_hash", None)
+
+        try:
+            cached, vector = self.cache.lookup(text, context, context_hash)
+        except Exception as e:
+            logger.warning("Cache semantica non disponibile per %s: %s", self.node_id, e)
+            super().process(inputs)
+            return
+
+        if cached is not None:
+            thought = self.output_thoughts(f"{self.node_id}_output")
+            thought.values = cached
+            self.outputs = [thought]
+            return
+
+        super().process(inputs)
+        try:
+            self.cache.insert(text, context, self.outputs[0].values, context_hash, vector)
+        except Exception as e:
+            logger.warning("Impossibile salvare in cache il risultato di %s: %s", self.node_id, e)
+
+    async def aprocess(self, inputs: Dict[str, Thought]) -> None:
+        """La cache semantica è sincrona: process viene eseguito in un thread separato"""
+        if self.cache is None:
+            await super().aprocess(inputs)
+            return
+        await asyncio.to_thread(self.process, inputs)
 
 def run_example():
     llm_config = LLMConfig(
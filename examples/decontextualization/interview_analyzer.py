@@ -1,55 +1,53 @@
-from typing import List, Dict, Type
+from typing import List, Dict, Type, Mapping, Any, ClassVar
+from types import MappingProxyType
 
 from src.got.node import LLMConfig
 from src.got.thought import Thought
 from src.got.generator import GoTGenerator
 
 
+_INTERVIEW_SCHEMA = MappingProxyType({
+    "type": "object",
+    "required": ["text", "source"],
+    "properties": {
+        "text": {"type": "string"},
+        "source": {"type": "string"}
+    }
+})
+
+
 class InterviewThought(Thought):
-    @property
-    def schema(self) -> dict:
-        return {
-            "type": "object",
-            "required": ["text", "source"],
-            "properties": {
-                "text": {"type": "string"},
-                "source": {"type": "string"}
-            }
-        }
-
-    def get_for_template(self, key: str) -> str:
-        match key:
-            case "text":
-                return str(self._values["text"])
-            case "source":
-                return str(self._values["source"])
-            case _:
-                raise KeyError(f"Campo '{key}' non valido per SentenceThought")
+    __slots__ = ()
+
+    _GETTERS = {
+        "text": lambda values: str(values["text"]),
+        "source": lambda values: str(values["source"]),
+    }
+
+    schema: ClassVar[Mapping[str, Any]] = _INTERVIEW_SCHEMA
+
+
+_TOPIC_SCHEMA = MappingProxyType({
+    "type": "object",
+    "required": ["topic_name", "content", "source"],
+    "properties": {
+        "topic_name": {"type": "string"},
+        "content": {"type": "string"},
+        "source": {"type": "string"}
+    }
+})
 
 
 class TopicThought(Thought):
-    @property
-    def schema(self) -> dict:
-        return {
-            "type": "object",
-            "required": ["topic_name", "content", "source"],
-            "properties": {
-                "topic_name": {"type": "string"},
-                "content": {"type": "string"},
-                "source": {"type": "string"}
-            }
-        }
-
-    def get_for_template(self, key: str) -> str:
-        match key:
-            case "topic_name":
-                return str(self._values["topic_name"])
-            case "content":
-                return str(self._values["content"])
-            case "source":
-                return str(self._values["source"])
-            case _:
-                raise KeyError(f"Campo '{key}' non valido per SentenceThought")
+    __slots__ = ()
+
+    _GETTERS = {
+        "topic_name": lambda values: str(values["topic_name"]),
+        "content": lambda values: str(values["content"]),
+        "source": lambda values: str(values["source"]),
+    }
+
+    schema: ClassVar[Mapping[str, Any]] = _TOPIC_SCHEMA
 
 
 class InterviewAnalyzer(GoTGenerator):
@@ -65,20 +63,22 @@ class InterviewAnalyzer(GoTGenerator):
     def output_cardinality(self) -> int:
         return -1
 
-    @property
-    def task_instruction(self) -> str:
-        return """
+    _TASK_INSTRUCTION = """
         You are an expert knowledge analyst. Analyze the following text and extract distinct topics.
         Focus on fine-grained decomposition with specific rather than broad topics.
 
-        Text: {input.text}
-
         Instructions:
         1. Include complete, unaltered text segments for each topic
         2. Create precise, narrowly-focused topics
         3. For Background/Professional Experience topics, include person's name/role in title
+
+        Text: {input.text}
         """
 
+    @property
+    def task_instruction(self) -> str:
+        return self._TASK_INSTRUCTION
+
 def run_example():
     llm_config = LLMConfig(
         name="llama2",
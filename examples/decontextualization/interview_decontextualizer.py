@@ -1,9 +1,12 @@
-from typing import Dict, Type, List
+from typing import Dict, Type, List, Tuple
+import asyncio
+import hashlib
 
 from src.got.node import GoTNode,LLMConfig
 from src.got.thought import Thought
 from .interview_analyzer import InterviewAnalyzer, InterviewThought, TopicThought
 from .decontextualizer import Decontextualizer, SentenceThought, DecontextualizedThought
+from .semantic_cache import SemanticCache, context_digest
 
 
 
@@ -27,24 +30,132 @@ class TopicToSentenceBridge(GoTNode):
 
     def process(self, inputs: Dict[str, Thought]) -> None:
         try:
-            topic = list(inputs.values())[0]
+            topic = next(iter(inputs.values()))
             sentence = SentenceThought(f"{self.node_id}_output")
             sentence.values = {
                 "sentence": topic.values["content"],
                 "context": topic.values["source"]
             }
+            # Hash del contesto, condiviso dai topic della stessa intervista:
+            # permette alla cache semantica di filtrare le voci senza ricalcolarlo
+            sentence._context_hash = context_digest(topic.values["source"])
             self.outputs = [sentence]
         except Exception as e:
             self.set_error(f"Error in bridge: {str(e)}")
 
-def process_interview():
+def decontextualize_topic(i: int, topic: Thought, llm_config: LLMConfig,
+                          cache: SemanticCache) -> List[Thought]:
+    """
+    Converte un topic in frase e la decontestualizza.
+
+    Raises:
+        ValueError: Se il bridge o il decontextualizer falliscono
+    """
+    # Bridge to convert topic to sentence
+    bridge = TopicToSentenceBridge(f"bridge_{i}", llm_config)
+    bridge.process({"topic": topic})
+
+    if bridge.has_error:
+        raise ValueError(f"Bridge error: {bridge.error_message}")
+
+    # Decontextualize the sentence
+    decontextualizer = Decontextualizer(f"decontext_{i}", llm_config, cache=cache)
+    decontextualizer.process({"input": bridge.outputs[0]})
+
+    if decontextualizer.has_error:
+        raise ValueError(f"Decontextualizer error: {decontextualizer.error_message}")
+
+    return decontextualizer.outputs
+
+async def decontextualize_topic_async(i: int, topic: Thought, llm_config: LLMConfig,
+                                      cache: SemanticCache) -> List[Thought]:
+    """
+    Esegue decontextualize_topic in un thread separato. Il ritmo delle richieste è
+    limitato da LLMConfig.requests_per_minute, condiviso da tutti i nodi con la stessa
+    configurazione, e i tentativi falliti sono ripetuti dal generator (MAX_RETRIES)
+    con backoff esponenziale (RETRY_BACKOFF).
+    """
+    return await asyncio.to_thread(decontextualize_topic, i, topic, llm_config, cache)
+
+async def run_pipeline(interview: InterviewThought, llm_config: LLMConfig, cache: SemanticCache,
+                       num_workers: int = 4) -> Tuple[List[Thought], Dict[int, Exception]]:
+    """
+    Analizza l'intervista e decontestualizza i topic estratti con un pool di worker
+    che consumano una coda condivisa; il ritmo delle richieste all'LLM è limitato da
+    llm_config.requests_per_minute.
+    I topic vengono accodati man mano che l'analyzer li genera in streaming, così che
+    la decontestualizzazione inizi prima della fine dell'analisi; i topic duplicati
+    vengono decontestualizzati una sola volta e il risultato replicato. I topic la cui
+    decontestualizzazione fallisce anche dopo i tentativi del generator vengono
+    restituiti al chiamante insieme all'errore.
+
+    Args:
+        interview: Intervista da elaborare
+        llm_config: Configurazione del modello LLM
+        cache: Cache semantica condivisa dai worker
+        num_workers: Numero massimo di topic elaborati in parallelo
+
+    Returns:
+        Coppia (Thought decontestualizzati nell'ordine dei topic, errori dei topic
+        non decontestualizzati indicizzati per posizione del topic)
+
+    Raises:
+        ValueError: Se l'analisi dell'intervista fallisce
+    """
+    results: Dict[int, List[Thought]] = {}
+    failures: Dict[int, Exception] = {}
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def worker() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            i, topic = item
+            try:
+                results[i] = await decontextualize_topic_async(i, topic, llm_config, cache)
+            except Exception as e:
+                failures[i] = e
+
+    # Step 2: Process the topics with a pool of workers
+    workers = [asyncio.create_task(worker()) for _ in range(num_workers)]
+
+    # Step 1: Analyze interview into topics, feeding each topic to the workers
+    # as soon as the analyzer streams it
+    # Topic identici (stesso contenuto e stessa fonte) vengono elaborati una sola volta:
+    # canonical associa ad ogni topic l'indice del primo topic uguale
+    analyzer = InterviewAnalyzer("analyzer", llm_config)
+    first_index: Dict[bytes, int] = {}
+    canonical: List[int] = []
+    try:
+        async for topic in analyzer.astream({"input": interview}):
+            i = len(canonical)
+            key = hashlib.blake2b(
+                f"{topic.values['content']}\0{topic.values['source']}".encode(), digest_size=16
+            ).digest()
+            canonical.append(first_index.setdefault(key, i))
+            if canonical[i] == i:
+                queue.put_nowait((i, topic))
+    finally:
+        for _ in workers:
+            queue.put_nowait(None)
+        await asyncio.gather(*workers)
+
+    thoughts = [thought for j in canonical for thought in results.get(j, [])]
+    # Anche i duplicati di un topic fallito risultano falliti
+    errors = {i: failures[j] for i, j in enumerate(canonical) if j in failures}
+    return thoughts, errors
+
+async def process_interview_async(num_workers: int = 4):
     # Configure LLM
     llm_config = LLMConfig(
         name="mistral:instruct",
         temperature=0.1,
         repeat_penalty=1.2,
         top_p=0.9,
-        num_ctx=4096
+        num_ctx=4096,
+        # Limite condiviso dall'analyzer e da tutti i decontextualizer
+        requests_per_minute=60
     )
 
     # Sample text
@@ -65,36 +176,16 @@ def process_interview():
         "source": "interview_20240329.txt"
     }
 
-    # Step 1: Analyze interview into topics
-    analyzer = InterviewAnalyzer("analyzer", llm_config)
-    analyzer.process({"input": interview})
+    # Cache semantica su file, riusata anche tra esecuzioni successive
+    cache = SemanticCache("decontextualizer_cache.sqlite")
 
-    if analyzer.has_error:
-        print(f"Analyzer error: {analyzer.error_message}")
+    try:
+        decontextualized_thoughts, failures = await run_pipeline(interview, llm_config, cache, num_workers)
+    except ValueError as e:
+        print(f"Analyzer error: {e}")
         return
-
-    topic_thoughts = analyzer.outputs
-
-    # Step 2: Process each topic
-    decontextualized_thoughts = []
-    for i, topic in enumerate(topic_thoughts):
-        # Bridge to convert topic to sentence
-        bridge = TopicToSentenceBridge(f"bridge_{i}", llm_config)
-        bridge.process({"topic": topic})
-
-        if bridge.has_error:
-            print(f"Bridge error for topic {i}: {bridge.error_message}")
-            continue
-
-        # Decontextualize the sentence
-        decontextualizer = Decontextualizer(f"decontext_{i}", llm_config)
-        decontextualizer.process({"input": bridge.outputs[0]})
-
-        if decontextualizer.has_error:
-            print(f"Decontextualizer error for topic {i}: {decontextualizer.error_message}")
-            continue
-
-        decontextualized_thoughts.extend(decontextualizer.outputs)
+    finally:
+        cache.close()
 
     # Print results
     print("\nDecontextualized Results:")
@@ -102,5 +193,11 @@ def process_interview():
         print(f"\n{i}. Original: {thought.values['in_context_sentence']}")
         print(f"   Standalone: {thought.values['standalone_sentence']}")
 
+    for i, error in failures.items():
+        print(f"\nTopic {i + 1} not decontextualized: {error}")
+
+def process_interview():
+    asyncio.run(process_interview_async())
+
 if __name__ == "__main__":
     process_interview()
@@ -0,0 +1,179 @@
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import sqlite3
+import threading
+
+import numpy as np
+
+
+def context_digest(context: str) -> str:
+    """Calcola l'hash del contenuto di un contesto, usato come chiave esatta della cache"""
+    return hashlib.blake2b(context.encode(), digest_size=16).hexdigest()
+
+
+class _ContextEntries:
+    """
+    Embedding e valori delle voci di un contesto. Gli embedding sono righe di una
+    matrice preallocata che raddoppia quando è piena, fino a capacity righe; oltre
+    il limite la voce più vecchia viene sostituita.
+    """
+
+    _INITIAL_ROWS = 16
+
+    def __init__(self, dim: int, capacity: int):
+        self.capacity = capacity
+        self.matrix = np.empty((min(self._INITIAL_ROWS, capacity), dim), dtype=np.float32)
+        self.payloads: List[Dict[str, Any]] = []
+        # Numero di righe in uso e posizione della prossima scrittura
+        self.count = 0
+        self._next = 0
+
+    def add(self, vector: np.ndarray, payload: Dict[str, Any]) -> None:
+        """Aggiunge una voce, sostituendo la più vecchia se il limite è raggiunto"""
+        if self.count < self.capacity:
+            if self.count == len(self.matrix):
+                grown = np.empty((min(2 * len(self.matrix), self.capacity), self.matrix.shape[1]),
+                                 dtype=np.float32)
+                grown[:self.count] = self.matrix[:self.count]
+                self.matrix = grown
+            self.payloads.append(payload)
+            self.count += 1
+        else:
+            self.payloads[self._next] = payload
+        self.matrix[self._next] = vector
+        self._next = (self._next + 1) % self.capacity
+
+    def best(self, vector: np.ndarray) -> Tuple[int, float]:
+        """Restituisce indice e similarità della voce più simile all'embedding"""
+        scores = self.matrix[:self.count] @ vector
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+
+class SemanticCache:
+    """
+    Cache semantica su file (SQLite) per i risultati di decontestualizzazione.
+    Una frase sufficientemente simile (similarità coseno sopra la soglia) ad una già
+    elaborata con lo stesso contesto riusa l'output salvato, evitando una nuova
+    chiamata all'LLM.
+
+    Il contesto deve coincidere esattamente (confronto per hash del contenuto): la
+    soglia si applica alla sola similarità tra le frasi, così che frasi diverse della
+    stessa intervista non vengano confuse grazie al contesto identico.
+    """
+
+    def __init__(self, path: str, embedding_model: str = "all-minilm", threshold: float = 0.92,
+                 max_entries_per_context: int = 1000):
+        """
+        Inizializza la cache.
+
+        Args:
+            path: Percorso del file SQLite (":memory:" per una cache volatile)
+            embedding_model: Modello Ollama usato per calcolare gli embedding
+            threshold: Similarità coseno minima tra le frasi per considerare valido un risultato
+            max_entries_per_context: Numero massimo di voci in memoria per contesto;
+                oltre il limite vengono sostituite le più vecchie
+        """
+        if max_entries_per_context <= 0:
+            raise ValueError("max_entries_per_context deve essere positivo")
+        self.threshold = threshold
+        self.max_entries_per_context = max_entries_per_context
+        self.embedding_model = embedding_model
+        self._embedder = None
+        # La cache può essere condivisa tra thread diversi
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sentence_entries ("
+            "id INTEGER PRIMARY KEY, context_hash TEXT, text TEXT, embedding BLOB, payload TEXT)"
+        )
+        self._conn.commit()
+
+        # Carica in memoria gli embedding normalizzati delle frasi, raggruppati per contesto
+        self._entries: Dict[str, _ContextEntries] = {}
+        rows = self._conn.execute(
+            "SELECT context_hash, embedding, payload FROM sentence_entries ORDER BY id"
+        )
+        for context_hash, embedding, payload in rows:
+            self._add_entry(context_hash, np.frombuffer(embedding, dtype=np.float32), json.loads(payload))
+
+    def _add_entry(self, context_hash: str, vector: np.ndarray, payload: Dict[str, Any]) -> None:
+        """Aggiunge una voce all'indice in memoria del contesto"""
+        entries = self._entries.get(context_hash)
+        if entries is None:
+            entries = _ContextEntries(len(vector), self.max_entries_per_context)
+            self._entries[context_hash] = entries
+        entries.add(vector, payload)
+
+    def _embed(self, text: str) -> np.ndarray:
+        """Calcola l'embedding normalizzato di un testo"""
+        if self._embedder is None:
+            from langchain_community.embeddings import OllamaEmbeddings
+            self._embedder = OllamaEmbeddings(model=self.embedding_model)
+
+        vector = np.asarray(self._embedder.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, sentence: str, context: str,
+               context_hash: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], np.ndarray]:
+        """
+        Cerca un risultato salvato per una frase semanticamente equivalente nello stesso contesto.
+
+        Args:
+            sentence: Frase da decontestualizzare
+            context: Contesto della frase
+            context_hash: Hash del contesto già calcolato dal chiamante (opzionale)
+
+        Returns:
+            Coppia (valori, embedding della frase): i valori sono una copia di quelli salvati,
+            con in_context_sentence pari alla frase cercata, se la similarità supera la soglia,
+            None altrimenti. L'embedding può essere passato al successivo insert
+        """
+        if context_hash is None:
+            context_hash = context_digest(context)
+        vector = self._embed(sentence)
+
+        with self._lock:
+            entries = self._entries.get(context_hash)
+            if entries is None:
+                return None, vector
+            best, score = entries.best(vector)
+            if score <= self.threshold:
+                return None, vector
+            values = dict(entries.payloads[best])
+
+        values["in_context_sentence"] = sentence
+        return values, vector
+
+    def insert(self, sentence: str, context: str, values: Dict[str, Any],
+               context_hash: Optional[str] = None, vector: Optional[np.ndarray] = None) -> None:
+        """
+        Salva un nuovo risultato nella cache.
+
+        Args:
+            sentence: Frase che ha prodotto il risultato
+            context: Contesto della frase
+            values: Valori del Thought di output
+            context_hash: Hash del contesto già calcolato dal chiamante (opzionale)
+            vector: Embedding della frase restituito da lookup (opzionale)
+        """
+        if context_hash is None:
+            context_hash = context_digest(context)
+        if vector is None:
+            vector = self._embed(sentence)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sentence_entries (context_hash, text, embedding, payload) VALUES (?, ?, ?, ?)",
+                (context_hash, sentence, vector.tobytes(), json.dumps(values))
+            )
+            self._conn.commit()
+
+            self._add_entry(context_hash, vector, dict(values))
+
+    def close(self) -> None:
+        """Chiude la connessione al file di cache"""
+        self._conn.close()
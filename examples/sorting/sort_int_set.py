@@ -1,6 +1,8 @@
-from typing import List, Dict, Type, Any
+from typing import List, Dict, Type, Any, Optional, Mapping, ClassVar
 from typing import cast
+from types import MappingProxyType
 
+import numpy as np
 
 from src.got.node import LLMConfig
 from src.got.thought import Thought
@@ -10,49 +12,35 @@ from src.got.repeat import GoTRepeat
 from src.operations.graph import GraphOfOperations
 
 
-class IntSetThought(Thought):
-    """Thought che rappresenta un insieme ordinato di interi"""
-
-    @property
-    def schema(self) -> dict:
-        return {
-            "type": "object",
-            "required": ["values", "size"],
-            "properties": {
-                "values": {
-                    "type": "array",
-                    "items": {"type": "integer"}
-                },
-                "size": {
-                    "type": "integer",
-                    "minimum": 0
-                }
-            },
-            "additionalProperties": False
+_INTSET_SCHEMA = MappingProxyType({
+    "type": "object",
+    "required": ["values", "size"],
+    "properties": {
+        "values": {
+            "type": "array",
+            "items": {"type": "integer"}
+        },
+        "size": {
+            "type": "integer",
+            "minimum": 0
         }
+    },
+    "additionalProperties": False
+})
 
-    def get_for_template(self, key: str) -> str:
-        """
-        Fornisce una rappresentazione formattata dei valori per il template.
 
-        Args:
-            key: Il campo richiesto
+class IntSetThought(Thought):
+    """Thought che rappresenta un insieme ordinato di interi"""
 
-        Returns:
-            str: Il valore formattato per il template
+    __slots__ = ()
 
-        Raises:
-            KeyError: Se la chiave richiesta non è valida
-        """
-        match key:
-            case "values":
-                return ", ".join(map(str, self._values["values"]))
-            case "size":
-                return str(self._values["size"])
-            case "halfsize":
-                return str(self._values["size"]/2)
-            case _:
-                raise KeyError(f"Campo '{key}' non valido per IntSetThought")
+    _GETTERS = {
+        "values": lambda values: ", ".join(map(str, values["values"])),
+        "size": lambda values: str(values["size"]),
+        "halfsize": lambda values: str(values["size"]/2),
+    }
+
+    schema: ClassVar[Mapping[str, Any]] = _INTSET_SCHEMA
 
     @classmethod
     def create(cls, thought_id: str, values: List[int]) -> 'IntSetThought':
@@ -94,13 +82,9 @@ class Splitter(GoTGenerator):
     def output_cardinality(self) -> int:
         return 2  # Produce sempre due sottoinsiemi
 
-    @property
-    def task_instruction(self) -> str:
-        return """
+    _TASK_INSTRUCTION = """
         Task: Split the given list of integers into two equal-sized subsets.
 
-        Input list: {input.values}
-
         <Instructions>
         1. Create exactly two subsets of equal size ({input.halfsize} integers each)
         2. Each number from the original list must appear exactly once in either subset
@@ -108,11 +92,19 @@ class Splitter(GoTGenerator):
         4. The order of numbers within each subset can be arbitrary
         5. All numbers from the original list must be used
         <\Instructions>
+
+        Input list: {input.values}
         """
 
+    @property
+    def task_instruction(self) -> str:
+        return self._TASK_INSTRUCTION
+
 class Sorter(GoTGenerator):
     """Generator that sorts a set of integers in ascending order"""
 
+    stateless = True
+
     @property
     def mapping(self) -> Dict[str, Type[Thought]]:
         return {"input": IntSetThought}
@@ -125,21 +117,30 @@ class Sorter(GoTGenerator):
     def output_cardinality(self) -> int:
         return 1
 
-    @property
-    def task_instruction(self) -> str:
-        return """
+    _TASK_INSTRUCTION = """
         Task: Sort the following array of integers in ascending order (smallest to largest).
 
-        Input array: {input.values}
-        Number of elements: {input.size}
-
         <Instructions>
         1. Arrange these numbers in ascending order
         2. Include every number exactly once
         3. Return the sorted array in the specified JSON format
         <\Instructions>
+
+        Input array: {input.values}
+        Number of elements: {input.size}
         """
 
+    @property
+    def task_instruction(self) -> str:
+        return self._TASK_INSTRUCTION
+
+    def _deterministic_output(self, inputs: Dict[str, Thought]) -> Optional[Dict[str, Any]]:
+        """Un insieme già ordinato (o con meno di due elementi) viene restituito senza invocare l'LLM"""
+        values = cast(IntSetThought, inputs["input"]).get_values()
+        if all(a <= b for a, b in zip(values, values[1:])):
+            return {"values": list(values), "size": len(values)}
+        return None
+
 class Merger(GoTGenerator):
     """Generator che unisce due IntSet in un unico IntSet"""
 
@@ -158,22 +159,33 @@ class Merger(GoTGenerator):
     def output_cardinality(self) -> int:
         return 1  # Produce un singolo insieme unito
 
-    @property
-    def task_instruction(self) -> str:
-        return """
+    _TASK_INSTRUCTION = """
         Combine two sets of integers into a single unified set.
 
-        First set of integers: {input1.values}
-        Second set of integers: {input2.values}
-
         <Instruction>
         Your task is to merge these sets while adhering to these requirements:
         1. Include every element from both input sets in the result
         2. Preserve the relative ordering of elements from each input set
         3. Ensure no elements are duplicated or omitted in the final set
         </Instruction>
+
+        First set of integers: {input1.values}
+        Second set of integers: {input2.values}
         """
 
+    @property
+    def task_instruction(self) -> str:
+        return self._TASK_INSTRUCTION
+
+    def _deterministic_output(self, inputs: Dict[str, Thought]) -> Optional[Dict[str, Any]]:
+        """Se uno dei due insiemi è vuoto, il risultato è l'altro insieme"""
+        values1 = cast(IntSetThought, inputs["input1"]).get_values()
+        values2 = cast(IntSetThought, inputs["input2"]).get_values()
+        if not values1 or not values2:
+            merged = list(values1) + list(values2)
+            return {"values": merged, "size": len(merged)}
+        return None
+
 
 class SortingKeepBest(GoTKeepBest):
     """Selettore che sceglie il miglior ordinamento tra quelli proposti"""
@@ -200,15 +212,17 @@ class SortingKeepBest(GoTKeepBest):
             return {"ordering_score": 1.0}
 
         # Calcola la percentuale di coppie correttamente ordinate
-        correct_pairs = sum(
-            1 for i in range(size-1)
-            if values[i] <= values[i+1]
-        )
+        arr = np.asarray(values, dtype=np.int64)
+        correct_pairs = int((arr[:-1] <= arr[1:]).sum())
         max_pairs = size - 1
 
         ordering_score = correct_pairs / max_pairs
         return {"ordering_score": ordering_score}
 
+    def _is_perfect(self, scores: Dict[str, float]) -> bool:
+        """Un ordinamento completamente corretto non può essere migliorato"""
+        return scores["ordering_score"] == 1.0
+
     def _compare(self, scores1: Dict[str, float], scores2: Dict[str, float]) -> int:
         """
         Confronta due set di score per determinare il miglior ordinamento.
@@ -226,12 +240,14 @@ class SortingKeepBest(GoTKeepBest):
         # Converti la differenza in un intero, mantenendo il segno
         return int((score1 - score2) * 1000)
 
-def create_sorting_graph(llm_config: LLMConfig) -> GraphOfOperations:
+def create_sorting_graph(llm_config: LLMConfig, fuse_threshold: int = 32) -> GraphOfOperations:
     """
     Crea un grafo di operazioni per l'ordinamento parallelo di insiemi.
 
     Args:
         llm_config: Configurazione del modello LLM da utilizzare
+        fuse_threshold: Dimensione massima degli insiemi ordinati con una singola
+            chiamata al Sorter invece dell'intero grafo (0 per disabilitare)
 
     Returns:
         GraphOfOperations configurato secondo lo schema richiesto
@@ -239,18 +255,27 @@ def create_sorting_graph(llm_config: LLMConfig) -> GraphOfOperations:
     # Crea il grafo principale
     graph = GraphOfOperations("sorting_graph", llm_config)
 
+    # Per insiemi piccoli un unico Sorter evita split, ordinamenti ripetuti e merge
+    if fuse_threshold > 0:
+        graph.set_fused_node(
+            Sorter("fused_sorter", llm_config),
+            lambda inputs: inputs["input"].values["size"] <= fuse_threshold
+        )
+
     # Crea i nodi
     splitter = Splitter("splitter", llm_config)
 
     # Branch 1
     sorter1 = Sorter("sorter1", llm_config)
-    repeater1 = GoTRepeat("repeater1", llm_config, sorter1, k=2)
     keeper1 = SortingKeepBest("keeper1", llm_config)
+    # Il secondo campione viene richiesto solo se il primo non è già ordinato
+    repeater1 = GoTRepeat("repeater1", llm_config, sorter1, k=2, should_stop=keeper1.is_perfect)
 
     # Branch 2
     sorter2 = Sorter("sorter2", llm_config)
-    repeater2 = GoTRepeat("repeater2", llm_config, sorter2, k=2)
     keeper2 = SortingKeepBest("keeper2", llm_config)
+    # Il secondo campione viene richiesto solo se il primo non è già ordinato
+    repeater2 = GoTRepeat("repeater2", llm_config, sorter2, k=2, should_stop=keeper2.is_perfect)
 
     # Nodo finale
     merger = Merger("merger", llm_config)
@@ -374,12 +399,9 @@ def verify_sorting(original: List[int], sorted_list: List[int]) -> bool:
     Returns:
         bool: True if the sorting is correct
     """
-    # Check if lists have the same elements
-    if set(original) != set(sorted_list):
-        return False
-
-    # Check if list is actually sorted
-    return all(sorted_list[i] <= sorted_list[i+1] for i in range(len(sorted_list)-1))
+    # The list is correct if it equals the sorted original (same elements,
+    # same multiplicities, ascending order)
+    return bool(np.array_equal(np.sort(np.asarray(original)), np.asarray(sorted_list)))
 
 def test_sorter():
     """Test the functionality of the Sorter node."""
@@ -456,9 +478,9 @@ def verify_merger_result(set1: List[int], set2: List[int], merged: List[int]) ->
     Returns:
         bool: True if the merger is correct
     """
-    original_elements = set(set1 + set2)
-    merged_elements = set(merged)
-    return original_elements == merged_elements
+    original_elements = np.sort(np.concatenate([np.asarray(set1), np.asarray(set2)]))
+    merged_elements = np.sort(np.asarray(merged))
+    return bool(np.array_equal(original_elements, merged_elements))
 
 def test_merger():
     """Tests the functionality of the Merger node."""
@@ -1,37 +1,48 @@
-from typing import List, Dict, Type
+from typing import List, Dict, Type, Mapping, Any, ClassVar
+from types import MappingProxyType
 
 from src.got.node import LLMConfig
 from src.got.thought import Thought
 from src.got.generator import GoTGenerator
 
+
+_TEXT_SCHEMA = MappingProxyType({
+    "type": "object",
+    "required": ["text"],
+    "properties": {
+        "text": {"type": "string"}
+    }
+})
+
+
 class TextThought(Thought):
-    @property
-    def schema(self) -> dict:
-        return {
-            "type": "object",
-            "required": ["text"],
-            "properties": {
-                "text": {"type": "string"}
-            }
-        }
-    def get_for_template(self, key: str) -> str:
+    __slots__ = ()
+
+    schema: ClassVar[Mapping[str, Any]] = _TEXT_SCHEMA
+
+    def _format_for_template(self, key: str) -> str:
         match key:
             case "text":
                 return str(self._values["text"])
             case _:
                 raise KeyError(f"Campo '{key}' non valido per TextThought")
 
+
+_MERGED_TEXT_SCHEMA = MappingProxyType({
+    "type": "object",
+    "required": ["merged_text"],
+    "properties": {
+        "merged_text": {"type": "string"}
+    }
+})
+
+
 class MergedTextThought(Thought):
-    @property
-    def schema(self) -> dict:
-        return {
-            "type": "object",
-            "required": ["merged_text"],
-            "properties": {
-                "merged_text": {"type": "string"}
-            }
-        }
-    def get_for_template(self, key: str) -> str:
+    __slots__ = ()
+
+    schema: ClassVar[Mapping[str, Any]] = _MERGED_TEXT_SCHEMA
+
+    def _format_for_template(self, key: str) -> str:
         match key:
             case "text":
                 return str(self._values["text"])
@@ -52,9 +63,7 @@ class TextMerger(GoTGenerator):
     def output_cardinality(self) -> int:
         return 1
 
-    @property
-    def task_instruction(self) -> str:
-        return """
+    _TASK_INSTRUCTION = """
         Merge these two texts into a coherent single text:
 
         First text: {text1.text}
@@ -62,6 +71,10 @@ class TextMerger(GoTGenerator):
         Second text: {text2.text}
         """
 
+    @property
+    def task_instruction(self) -> str:
+        return self._TASK_INSTRUCTION
+
 def run_example():
     llm_config = LLMConfig(
         name="llama2",
@@ -1,22 +1,27 @@
-from typing import List, Dict, Type
+from typing import List, Dict, Type, Mapping, Any, ClassVar
+from types import MappingProxyType
 
 from src.got.node import LLMConfig
 from src.got.thought import Thought
 from src.got.generator import GoTGenerator
 
 
+_TEXT_INPUT_SCHEMA = MappingProxyType({
+    "type": "object",
+    "required": ["text", "max_words"],
+    "properties": {
+        "text": {"type": "string"},
+        "max_words": {"type": "integer"}
+    }
+})
+
+
 class TextInputThought(Thought):
-    @property
-    def schema(self) -> dict:
-        return {
-            "type": "object",
-            "required": ["text", "max_words"],
-            "properties": {
-                "text": {"type": "string"},
-                "max_words": {"type": "integer"}
-            }
-        }
-    def get_for_template(self, key: str) -> str:
+    __slots__ = ()
+
+    schema: ClassVar[Mapping[str, Any]] = _TEXT_INPUT_SCHEMA
+
+    def _format_for_template(self, key: str) -> str:
         match key:
             case "text":
                 return str(self._values["text"])
@@ -25,17 +30,22 @@ class TextInputThought(Thought):
             case _:
                 raise KeyError(f"Campo '{key}' non valido per TextThought")
 
+
+_SUMMARY_SCHEMA = MappingProxyType({
+    "type": "object",
+    "required": ["summary"],
+    "properties": {
+        "summary": {"type": "string"}
+    }
+})
+
+
 class SummaryThought(Thought):
-    @property
-    def schema(self) -> dict:
-        return {
-            "type": "object",
-            "required": ["summary"],
-            "properties": {
-                "summary": {"type": "string"}
-            }
-        }
-    def get_for_template(self, key: str) -> str:
+    __slots__ = ()
+
+    schema: ClassVar[Mapping[str, Any]] = _SUMMARY_SCHEMA
+
+    def _format_for_template(self, key: str) -> str:
         match key:
             case "summary":
                 return str(self._values["summary"])
@@ -55,15 +65,17 @@ class TextSummaryGenerator(GoTGenerator):
     def output_cardinality(self) -> int:
         return 1
 
-    @property
-    def task_instruction(self) -> str:
-        return """
+    _TASK_INSTRUCTION = """
         Summarize the following text in {input.max_words} words or less.
         Focus on the main points while maintaining clarity and coherence.
 
         Text: {input.text}
         """
 
+    @property
+    def task_instruction(self) -> str:
+        return self._TASK_INSTRUCTION
+
 def run_example():
     # Configurazione LLM
     llm_config = LLMConfig(
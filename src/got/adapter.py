@@ -11,10 +11,11 @@ class GoTAdapter:
     """
 
     @staticmethod
-    def connect_generator_to_keeper(generator: GoTGenerator, keeper: GoTKeepBest) -> None:
+    def check_generator_to_keeper(generator: GoTGenerator, keeper: GoTKeepBest) -> None:
         """
-        Collega un GoTGenerator a un GoTKeepBest verificando la compatibilità
-        e trasferendo gli output nel formato corretto.
+        Verifica che un GoTGenerator possa essere collegato a un GoTKeepBest.
+        I controlli dipendono solo dai tipi dei nodi e possono essere eseguiti
+        una sola volta, alla costruzione del grafo.
 
         Args:
             generator: Il nodo GoTGenerator che produce gli output
@@ -36,16 +37,46 @@ class GoTAdapter:
                 "Generator must have output_cardinality != 1 to be connected to a Keeper"
             )
 
+    @staticmethod
+    def generator_to_keeper_inputs(generator: GoTGenerator, keeper: GoTKeepBest) -> List[Thought]:
+        """
+        Verifica la compatibilità tra un GoTGenerator e un GoTKeepBest e trasforma
+        gli output del generator nel formato di input atteso dal keeper.
+
+        Args:
+            generator: Il nodo GoTGenerator che produce gli output
+            keeper: Il nodo GoTKeepBest che seleziona il migliore
+
+        Returns:
+            Lista dei Thought candidati per il keeper
+
+        Raises:
+            ValueError: Se i tipi di Thought non sono compatibili
+        """
+        GoTAdapter.check_generator_to_keeper(generator, keeper)
+
         # Trasforma gli output del generator nel formato atteso dal keeper
         outputs = generator.outputs
         if not outputs:
             raise ValueError("Generator has no outputs to process")
 
-        # Crea il dizionario di input per il keeper
-        keeper_inputs = {
-            f"thought_{i}": thought
-            for i, thought in enumerate(outputs)
-        }
+        # Il keeper accetta direttamente la lista degli output
+        return outputs
+
+    @staticmethod
+    def connect_generator_to_keeper(generator: GoTGenerator, keeper: GoTKeepBest) -> None:
+        """
+        Collega un GoTGenerator a un GoTKeepBest verificando la compatibilità
+        e trasferendo gli output nel formato corretto.
+
+        Args:
+            generator: Il nodo GoTGenerator che produce gli output
+            keeper: Il nodo GoTKeepBest che seleziona il migliore
+
+        Raises:
+            ValueError: Se i tipi di Thought non sono compatibili
+        """
+        keeper_inputs = GoTAdapter.generator_to_keeper_inputs(generator, keeper)
 
         # Processa gli input con il keeper
         keeper.process(keeper_inputs)
@@ -0,0 +1,98 @@
+from typing import Any, Optional, Protocol
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+
+
+def make_key(*parts: Any) -> str:
+    """
+    Calcola una chiave di cache stabile a partire da valori serializzabili in JSON.
+
+    Args:
+        parts: Valori che identificano la richiesta (modello, parametri, prompt, ...)
+
+    Returns:
+        Digest SHA-256 esadecimale
+    """
+    payload = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CacheBackend(Protocol):
+    """Interfaccia di una cache chiave -> risposta dell'LLM"""
+
+    def get(self, key: str) -> Optional[str]:
+        """Restituisce la risposta salvata per la chiave, oppure None"""
+        ...
+
+    def set(self, key: str, value: str) -> None:
+        """Salva la risposta associata alla chiave"""
+        ...
+
+
+class MemoryCache:
+    """
+    Cache in memoria, valida per la durata del processo. Conserva al più max_entries
+    risposte, scartando quelle usate meno di recente.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Args:
+            max_entries: Numero massimo di risposte conservate
+        """
+        if max_entries <= 0:
+            raise ValueError("max_entries deve essere positivo")
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class DiskCache:
+    """Cache persistente su file SQLite, riusabile tra esecuzioni successive"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Percorso del file SQLite
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)", (key, value)
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Chiude la connessione al file di cache"""
+        self._conn.close()
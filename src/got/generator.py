@@ -1,13 +1,175 @@
-from typing import Dict, List, Set, Tuple, Any, Optional, Type
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Mapping, Tuple, Any, Optional, Type, Union
 from abc import abstractmethod
+from functools import cached_property, lru_cache
+import asyncio
 import json
 import re
+import time
+from string import Template
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-
-from src.got.node import GoTNode, LLMConfig
+from src.got.node import GoTNode, LLMConfig, _get_rate_limiter
 from src.got.thought import Thought
+from src.got.cache import make_key
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# I moduli di LangChain vengono importati al primo utilizzo
+if TYPE_CHECKING:
+    from langchain_core.messages import SystemMessage
+    from langchain_core.prompt_values import PromptValue
+
+
+# Variabili del template nella forma {input.field}
+_TEMPLATE_VAR_RE = re.compile(r'\{(\w+)\.(\w+)\}')
+# Inizio dell'array 'items' in una risposta JSON ricevuta in streaming
+_ITEMS_ARRAY_RE = re.compile(r'"items"\s*:\s*\[')
+
+
+@lru_cache(maxsize=128)
+def _parse_template_variables(template: str) -> Tuple[Tuple[str, str], ...]:
+    """
+    Estrae, una sola volta per template, le variabili nella forma {input.field}
+    nell'ordine in cui compaiono.
+    """
+    return tuple(match.groups() for match in _TEMPLATE_VAR_RE.finditer(template))
+
+
+def _create_example_from_schema(schema: Mapping[str, Any]) -> Any:
+    """
+    Creates a meaningful example structure from a JSON schema.
+
+    Args:
+        schema: JSON schema to generate an example from
+
+    Returns:
+        An example object that follows the schema structure
+    """
+    if schema["type"] == "object":
+        result = {}
+        for prop, details in schema["properties"].items():
+            if prop in schema.get("required", []):
+                result[prop] = _create_example_from_schema(details)
+        return result
+
+    elif schema["type"] == "array":
+        # For arrays, create a meaningful example with multiple elements
+        item_example = _create_example_from_schema(schema["items"])
+        if isinstance(item_example, (int, float)):
+            return [1, 2, 3]  # More representative for number arrays
+        return [item_example]
+
+    elif schema["type"] == "string":
+        return "example"
+
+    elif schema["type"] == "number":
+        return 1.23
+
+    elif schema["type"] == "integer":
+        return 42
+
+    elif schema["type"] == "boolean":
+        return True
+
+    else:
+        return None
+
+
+@lru_cache(maxsize=None)
+def _example_for(thought_cls: Type[Thought], multiple: bool) -> str:
+    """
+    Restituisce, una sola volta per tipo di Thought, l'esempio JSON mostrato all'LLM
+    nel formato dell'output.
+
+    Args:
+        thought_cls: Tipo di Thought prodotto dal generator
+        multiple: Se True l'esempio è racchiuso nell'array 'items'
+    """
+    example_json = _create_example_from_schema(thought_cls.schema)
+    if multiple:
+        example_json = {"items": [example_json]}
+
+    return json.dumps(example_json, indent=2)
+
+
+@lru_cache(maxsize=None)
+def _schema_for(thought_cls: Type[Thought], multiple: bool) -> str:
+    """
+    Restituisce lo schema JSON atteso in risposta, in forma compatta, usato nei prompt
+    di riparazione delle risposte non valide.
+
+    Args:
+        thought_cls: Tipo di Thought prodotto dal generator
+        multiple: Se True lo schema è racchiuso nell'array 'items'
+    """
+    schema = dict(thought_cls.schema)
+    if multiple:
+        schema = {
+            "type": "object",
+            "properties": {"items": {"type": "array", "items": schema}},
+            "required": ["items"]
+        }
+    return json.dumps(schema, separators=(",", ":"))
+
+
+class _StreamingItemsParser:
+    """
+    Estrae in modo incrementale gli elementi dell'array 'items' da una risposta JSON
+    ricevuta in streaming, restituendo ogni elemento non appena è completo.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        # Posizione del prossimo elemento nel buffer, -1 finché l'array non è stato trovato
+        self._pos = -1
+        self._done = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Aggiunge un frammento di testo al buffer.
+
+        Args:
+            chunk: Frammento della risposta dell'LLM
+
+        Returns:
+            Lista degli elementi completati grazie al nuovo frammento
+        """
+        self._buffer += chunk
+        items = []
+
+        if self._pos < 0:
+            match = _ITEMS_ARRAY_RE.search(self._buffer)
+            if match is None:
+                return items
+            self._pos = match.end()
+
+        while not self._done:
+            # Salta spazi e separatori tra gli elementi
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n,":
+                self._pos += 1
+            if self._pos >= len(self._buffer):
+                break
+            if self._buffer[self._pos] == "]":
+                self._done = True
+                break
+
+            try:
+                item, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Elemento non ancora completo
+                break
+            if end >= len(self._buffer):
+                # Un valore a fine buffer (es. un numero) potrebbe continuare nel frammento successivo
+                break
+
+            items.append(item)
+            self._pos = end
+
+        return items
+
 
 class GoTGenerator(GoTNode):
     """
@@ -15,6 +177,18 @@ class GoTGenerator(GoTNode):
     Gestisce la generazione di output strutturati usando un LLM.
     """
 
+    # Tentativi di correzione di una risposta non valida prima di rigenerarla da capo
+    REPAIR_ATTEMPTS = 2
+
+    # Attesa in secondi prima del secondo tentativo di generazione, raddoppiata ad ogni
+    # tentativo successivo (0 = tentativi immediati). Utile con errori transitori del
+    # server, come limiti di richieste o timeout
+    RETRY_BACKOFF: float = 0.0
+
+    # True se il generator non ha stato oltre a outputs ed errore: GoTRepeat può
+    # riusarlo per tutte le ripetizioni invece di crearne un clone per ciascuna
+    stateless: bool = False
+
     @property
     @abstractmethod
     def task_instruction(self) -> str:
@@ -44,59 +218,11 @@ class GoTGenerator(GoTNode):
         """
         return list(self.mapping.values())
 
-    def _create_example_from_schema(self, schema: dict) -> Any:
-        """
-        Creates a meaningful example structure from a JSON schema.
-
-        Args:
-            schema: JSON schema to generate an example from
-
-        Returns:
-            An example object that follows the schema structure
-        """
-        if schema["type"] == "object":
-            result = {}
-            for prop, details in schema["properties"].items():
-                if prop in schema.get("required", []):
-                    result[prop] = self._create_example_from_schema(details)
-            return result
-
-        elif schema["type"] == "array":
-            # For arrays, create a meaningful example with multiple elements
-            item_example = self._create_example_from_schema(schema["items"])
-            if isinstance(item_example, (int, float)):
-                return [1, 2, 3]  # More representative for number arrays
-            return [item_example]
-
-        elif schema["type"] == "string":
-            return "example"
-
-        elif schema["type"] == "number":
-            return 1.23
-
-        elif schema["type"] == "integer":
-            return 42
-
-        elif schema["type"] == "boolean":
-            return True
-
-        else:
-            return None
-
     def _get_output_format_instruction(self) -> str:
         """
         Generates clear instructions for the expected output format.
         """
-        thought_class = self.output_thoughts
-        example_thought = thought_class("example")
-        schema = example_thought.schema
-        example_json = self._create_example_from_schema(schema)
-
-        if self.output_cardinality != 1:
-            example_json = {"items": [example_json]}
-
-        json_str = json.dumps(example_json, indent=2)
-        json_str = json_str.replace("{", "{{").replace("}", "}}")
+        json_str = _example_for(self.output_thoughts, self.output_cardinality != 1)
 
         format_instruction = (
             "\nProvide the response as a JSON object with the following structure:\n"
@@ -121,70 +247,96 @@ class GoTGenerator(GoTNode):
     def template(self) -> str:
         """
         Combina le istruzioni del task con il formato dell'output richiesto.
+        Le parti statiche (preambolo e formato dell'output) precedono le istruzioni
+        del task, così che il prefisso del prompt sia identico tra le chiamate.
         """
-        return (
-            "IMPORTANT: This is a new conversation. Ignore all previous context and history.\n\n"
-            f"{self.task_instruction}\n"
-            f"{self._get_output_format_instruction()}"
-        )
+        return self._get_template_parts()[0]
+
+    @property
+    def _static_prefix(self) -> str:
+        """Parte del template precedente la prima variabile"""
+        return self._get_template_parts()[1]
+
+    @property
+    def _dynamic_suffix(self) -> str:
+        """Parte del template a partire dalla riga della prima variabile"""
+        return self._get_template_parts()[2]
+
+    @property
+    def _suffix_template(self) -> Template:
+        """
+        string.Template del suffisso: le variabili {input.field} diventano ${input__field},
+        valorizzate ad ogni chiamata con substitute. Il testo non viene interpretato da
+        LangChain, quindi le parentesi graffe non vanno escapate.
+        """
+        return self._get_template_parts()[3]
+
+    def _get_template_parts(self) -> Tuple[str, str, str, Template]:
+        """
+        Restituisce template, prefisso statico, suffisso e string.Template del suffisso,
+        calcolati una sola volta per classe e condivisi da tutte le istanze, dato che
+        task_instruction e formato dell'output sono costanti per ogni sottoclasse.
+        """
+        cls = type(self)
+        parts = cls.__dict__.get("_template_parts")
+        if parts is None:
+            template = (
+                "IMPORTANT: This is a new conversation. Ignore all previous context and history.\n"
+                f"{self._get_output_format_instruction()}\n"
+                f"{self.task_instruction}\n"
+            )
+            prefix, suffix = self._split_template(template)
+            escaped = suffix.replace("$", "$$")
+            parts = (template, prefix, suffix, Template(_TEMPLATE_VAR_RE.sub(r'${\1__\2}', escaped)))
+            cls._template_parts = parts
+        return parts
+
+    @cached_property
+    def _system_message(self) -> "SystemMessage":
+        """Messaggio di sistema con il prefisso statico, identico ad ogni chiamata"""
+        from langchain_core.messages import SystemMessage
+
+        return SystemMessage(content=self._static_prefix)
 
     def _extract_json(self, text: str) -> Any:
         """
         Estrae il JSON dalla risposta dell'LLM.
+        Con LLMConfig.json_mode la risposta è JSON puro e basta un parsing diretto
+        (con orjson, se installato); altrimenti, o se il server ha ignorato il formato,
+        restituisce il primo oggetto JSON valido contenuto nel testo, esaminando con
+        raw_decode solo le posizioni delle '{'.
         """
-        def find_matching_bracket(s, start):
-            count = 1
-            pos = start
-            while count > 0 and pos < len(s):
-                if s[pos] == '{':
-                    count += 1
-                elif s[pos] == '}':
-                    count -= 1
-                pos += 1
-            return pos if count == 0 else -1
-
         try:
+            if orjson is not None:
+                return orjson.loads(text)
             return json.loads(text)
-        except json.JSONDecodeError:
-            pos = 0
-            while True:
-                start = text.find('{', pos)
-                if start == -1:
-                    break
-
-                end = find_matching_bracket(text, start + 1)
-                if end == -1:
-                    pos = start + 1
-                    continue
-
-                try:
-                    json_str = text[start:end]
-                    return json.loads(json_str)
-                except json.JSONDecodeError:
-                    pos = start + 1
-                    continue
+        except ValueError:
+            # orjson.JSONDecodeError e json.JSONDecodeError derivano entrambe da ValueError
+            pass
 
+        decoder = json.JSONDecoder()
+        start = text.find('{')
+        while start != -1:
             try:
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                if start >= 0 and end > 0:
-                    json_str = text[start:end]
-                    return json.loads(json_str)
-            except:
-                pass
+                return decoder.raw_decode(text, start)[0]
+            except json.JSONDecodeError:
+                start = text.find('{', start + 1)
 
-            raise ValueError("No valid JSON object found in text")
+        raise ValueError("No valid JSON object found in text")
 
-    def _create_thoughts(self, data: Any) -> List[Thought]:
+    def _create_thoughts(self, data: Any, thought_prefix: Optional[str] = None) -> List[Thought]:
             """
             Crea i Thought a partire dai dati JSON validati.
 
             Args:
                 data: Dati JSON validati con possibile root element 'items'
+                thought_prefix: Prefisso degli id dei Thought (default: node_id)
 
             Returns:
                 Lista di Thought creati
             """
+            prefix = thought_prefix or self.node_id
+
             # Se cardinalità != 1, ci aspettiamo il root element 'items'
             if self.output_cardinality != 1:
                 if not isinstance(data, dict) or 'items' not in data:
@@ -200,36 +352,52 @@ class GoTGenerator(GoTNode):
                 # Crea un thought per ogni item
                 thoughts = []
                 for i, item in enumerate(items):
-                    thought = self.output_thoughts(f"{self.node_id}_output_{i}")
+                    thought = self.output_thoughts(f"{prefix}_output_{i}")
                     thought.values = item
                     thoughts.append(thought)
                 return thoughts
 
             # Se cardinalità == 1, ci aspettiamo un singolo oggetto
             else:
-                thought = self.output_thoughts(f"{self.node_id}_output")
+                thought = self.output_thoughts(f"{prefix}_output")
                 thought.values = data
                 return [thought]
 
+    def _get_input_table(self) -> Tuple[frozenset, Tuple[Tuple[str, Type[Thought]], ...]]:
+        """
+        Restituisce i nomi e i tipi degli input dichiarati nel mapping.
+        Vengono calcolati al primo utilizzo e condivisi da tutte le istanze della classe.
+
+        Returns:
+            Tupla (insieme dei nomi, coppie (nome, tipo) nell'ordine del mapping)
+        """
+        cls = type(self)
+        table = cls.__dict__.get("_input_table")
+        if table is None:
+            mapping = self.mapping
+            table = (frozenset(mapping), tuple(mapping.items()))
+            cls._input_table = table
+        return table
+
     def _validate_inputs(self, inputs: Dict[str, Thought]) -> None:
         """
         Verifica che gli input forniti corrispondano al mapping dichiarato.
         """
-        expected_inputs = self.mapping
+        expected_keys, expected_types = self._get_input_table()
 
-        # Verifica input mancanti
-        missing = set(expected_inputs.keys()) - set(inputs.keys())
-        if missing:
-            raise ValueError(f"Input richiesti mancanti: {missing}")
+        if inputs.keys() ^ expected_keys:
+            # Verifica input mancanti
+            missing = expected_keys - inputs.keys()
+            if missing:
+                raise ValueError(f"Input richiesti mancanti: {set(missing)}")
 
-        # Verifica input inattesi
-        unexpected = set(inputs.keys()) - set(expected_inputs.keys())
-        if unexpected:
-            raise ValueError(f"Input non dichiarati nel mapping: {unexpected}")
+            # Verifica input inattesi
+            unexpected = inputs.keys() - expected_keys
+            raise ValueError(f"Input non dichiarati nel mapping: {set(unexpected)}")
 
         # Verifica tipi
-        for input_name, thought in inputs.items():
-            expected_type = expected_inputs[input_name]
+        for input_name, expected_type in expected_types:
+            thought = inputs[input_name]
             if not isinstance(thought, expected_type):
                 raise ValueError(
                     f"Input '{input_name}' ha tipo errato. "
@@ -237,9 +405,24 @@ class GoTGenerator(GoTNode):
                     f"ricevuto {type(thought).__name__}"
                 )
 
+    def _deterministic_output(self, inputs: Dict[str, Thought]) -> Optional[Any]:
+        """
+        Permette alle sottoclassi di restituire direttamente l'output per input banali,
+        evitando la chiamata all'LLM.
+
+        Args:
+            inputs: Dizionario degli input già validati
+
+        Returns:
+            Dati nello stesso formato del JSON atteso dall'LLM, oppure None
+            se è necessario invocare l'LLM
+        """
+        return None
+
     def process(self, inputs: Dict[str, Thought]) -> None:
         """
         Processa gli input attraverso l'LLM per generare nuovi Thought.
+        Equivale ad un batch_process con un solo insieme di input.
 
         Args:
             inputs: Dizionario che mappa i nomi degli input ai rispettivi Thought
@@ -247,26 +430,53 @@ class GoTGenerator(GoTNode):
         Raises:
             ValueError: Se gli input non sono validi o se la generazione fallisce
         """
-        try:
-            # Valida che gli input corrispondano a quelli dichiarati
-            self._validate_inputs(inputs)
+        self.outputs = self.batch_process([inputs], [self.node_id])[0]
 
-            for attempt in range(self.MAX_RETRIES):
-                try:
-                    # Invoca l'LLM con gli input validati
-                    llm_output = self._invoke_llm(inputs)
+    async def aprocess(self, inputs: Dict[str, Thought]) -> None:
+        """
+        Versione asincrona di process: l'LLM viene invocato con ainvoke,
+        senza occupare un thread durante l'attesa della risposta.
 
-                    #print("llm_output:")
-                    #print(llm_output)
+        Args:
+            inputs: Dizionario che mappa i nomi degli input ai rispettivi Thought
 
-                    # Estrae il JSON dalla risposta
-                    output_data = self._extract_json(llm_output)
+        Raises:
+            ValueError: Se gli input non sono validi o se la generazione fallisce
+        """
+        try:
+            self._validate_inputs(inputs)
 
-                    # Crea i Thought di output
-                    output_thoughts = self._create_thoughts(output_data)
-                    self.outputs = output_thoughts
+            # Salta l'LLM se il risultato è determinabile direttamente dagli input
+            output_data = self._deterministic_output(inputs)
+            if output_data is not None:
+                self.outputs = self._create_thoughts(output_data)
+                return
+
+            prompt = self._build_prompt(inputs)
+            cache_key = self._cache_key(prompt)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    self.outputs = self._create_thoughts(self._extract_json(cached))
                     return
 
+            for attempt in range(self.MAX_RETRIES):
+                if attempt > 0 and self.RETRY_BACKOFF > 0:
+                    await asyncio.sleep(self._retry_delay(attempt))
+                try:
+                    llm_output = await self._ainvoke_until_json(prompt)
+                    for repair in range(self.REPAIR_ATTEMPTS + 1):
+                        try:
+                            self.outputs = self._create_thoughts(self._extract_json(llm_output))
+                            break
+                        except Exception as e:
+                            if repair == self.REPAIR_ATTEMPTS:
+                                raise
+                            # Una correzione breve costa meno di una nuova generazione
+                            llm_output = await self._ainvoke_until_json(self._repair_prompt(llm_output, e))
+                    if cache_key is not None:
+                        self.response_cache.set(cache_key, llm_output)
+                    return
                 except Exception as e:
                     if attempt == self.MAX_RETRIES - 1:
                         raise ValueError(
@@ -278,28 +488,399 @@ class GoTGenerator(GoTNode):
             self.set_error(error_msg)
             raise
 
-    def _invoke_llm(self, inputs: Dict[str, Thought]) -> str:
+    async def _ainvoke_until_json(self, prompt: Union["PromptValue", str]) -> str:
+        """
+        Invoca l'LLM in streaming e interrompe la generazione appena la risposta contiene
+        un oggetto JSON completo, evitando di attendere l'eventuale testo successivo.
+
+        Args:
+            prompt: Prompt costruito con _build_prompt o _repair_prompt
+
+        Returns:
+            Il testo ricevuto fino alla chiusura del primo oggetto JSON valido,
+            oppure l'intera risposta se non ne contiene
+        """
+        from langchain_core.output_parsers import StrOutputParser
+
+        chain = self.llm | StrOutputParser()
+        decoder = json.JSONDecoder()
+        buffer = ""
+        async with self._llm_slot():
+            stream = chain.astream(prompt)
+            try:
+                async for chunk in stream:
+                    buffer += chunk
+                    # Un oggetto può essersi chiuso solo in un frammento che contiene '}'
+                    if "}" not in chunk:
+                        continue
+                    # Si decodifica solo dalla prima '{': un oggetto annidato completo
+                    # non indica che l'oggetto esterno sia terminato
+                    start = buffer.find("{")
+                    if start == -1:
+                        continue
+                    try:
+                        decoder.raw_decode(buffer, start)
+                        return buffer
+                    except json.JSONDecodeError:
+                        pass
+            finally:
+                # Chiudere lo stream interrompe la generazione lato server
+                await stream.aclose()
+        return buffer
+
+    async def astream(self, inputs: Dict[str, Thought]) -> AsyncIterator[Thought]:
+        """
+        Processa gli input restituendo i Thought di output man mano che l'LLM li genera.
+        Per i nodi con più output ogni elemento dell'array 'items' viene prodotto appena
+        la risposta in streaming lo contiene per intero, così che i nodi successivi possano
+        iniziare ad elaborarlo prima della fine della generazione. Se lo streaming non
+        produce alcun elemento si ripiega su process, con i relativi tentativi.
+        Al termine outputs contiene tutti i Thought prodotti.
+
+        Args:
+            inputs: Dizionario che mappa i nomi degli input ai rispettivi Thought
+
+        Yields:
+            I Thought di output, nell'ordine in cui vengono generati
+
+        Raises:
+            ValueError: Se gli input non sono validi o se la generazione fallisce
+        """
+        produced: List[Thought] = []
+
+        try:
+            self._validate_inputs(inputs)
+            streamable = self.output_cardinality != 1 and self._deterministic_output(inputs) is None
+        except Exception as e:
+            self.set_error(f"Errore nel nodo {self.node_id}: {str(e)}")
+            raise
+
+        if streamable:
+            parser = _StreamingItemsParser()
+            from langchain_core.output_parsers import StrOutputParser
+
+            chain = self.llm | StrOutputParser()
+            try:
+                async with self._llm_slot():
+                    async for chunk in chain.astream(self._build_prompt(inputs)):
+                        for item in parser.feed(chunk):
+                            thought = self.output_thoughts(f"{self.node_id}_output_{len(produced)}")
+                            thought.values = item
+                            produced.append(thought)
+                            yield thought
+            except Exception as e:
+                # Gli elementi già prodotti non possono essere ritirati
+                if produced:
+                    self.set_error(f"Errore nel nodo {self.node_id}: {str(e)}")
+                    raise ValueError(f"Streaming interrotto: {str(e)}")
+
+            if produced:
+                self.outputs = produced
+                return
+
+        await asyncio.to_thread(self.process, inputs)
+        for thought in self.outputs:
+            yield thought
+
+    def batch_process(self, inputs_list: List[Dict[str, Thought]],
+                      thought_prefixes: Optional[List[str]] = None) -> List[List[Thought]]:
+        """
+        Processa più insiemi di input inviando tutti i prompt all'LLM in un'unica
+        richiesta batch. Le risposte non valide vengono prima corrette con un breve
+        prompt di riparazione (fino a REPAIR_ATTEMPTS volte); solo i prompt ancora
+        falliti vengono poi rigenerati da capo.
+
+        Args:
+            inputs_list: Lista di dizionari di input, uno per prompt
+            thought_prefixes: Prefissi opzionali per gli id dei Thought di ciascun prompt
+
+        Returns:
+            Lista degli output prodotti per ciascun insieme di input, nello stesso ordine
+
+        Raises:
+            ValueError: Se gli input non sono validi o se la generazione fallisce
+        """
+        try:
+            if thought_prefixes is None:
+                thought_prefixes = [f"{self.node_id}_{i}" for i in range(len(inputs_list))]
+
+            results: List[Optional[List[Thought]]] = [None] * len(inputs_list)
+            prompts: Dict[int, "PromptValue"] = {}
+            cache_keys: Dict[int, Optional[str]] = {}
+            # Lo stesso dizionario di input ripetuto più volte (es. le k ripetizioni di
+            # GoTRepeat) viene validato e reso in un prompt una sola volta
+            rendered: Dict[int, Tuple[Any, Optional["PromptValue"], Optional[str]]] = {}
+            for i, inputs in enumerate(inputs_list):
+                entry = rendered.get(id(inputs))
+                if entry is None:
+                    self._validate_inputs(inputs)
+                    # Salta l'LLM se il risultato è determinabile direttamente dagli input
+                    output_data = self._deterministic_output(inputs)
+                    if output_data is not None:
+                        entry = (output_data, None, None)
+                    else:
+                        prompt = self._build_prompt(inputs)
+                        entry = (None, prompt, self._cache_key(prompt))
+                    rendered[id(inputs)] = entry
+
+                output_data, prompt, cache_key = entry
+                if prompt is None:
+                    results[i] = self._create_thoughts(output_data, thought_prefixes[i])
+                else:
+                    prompts[i] = prompt
+                    cache_keys[i] = cache_key
+
+            # Le risposte già in cache non vengono richieste all'LLM
+            pending = []
+            for i in prompts:
+                cached = self.response_cache.get(cache_keys[i]) if cache_keys[i] is not None else None
+                if cached is not None:
+                    results[i] = self._create_thoughts(self._extract_json(cached), thought_prefixes[i])
+                else:
+                    pending.append(i)
+
+            if not pending:
+                return results
+            last_error: Optional[Exception] = None
+
+            for attempt in range(self.MAX_RETRIES):
+                if attempt > 0 and self.RETRY_BACKOFF > 0:
+                    time.sleep(self._retry_delay(attempt))
+                llm_outputs = dict(zip(pending, self._invoke_llm_batch([prompts[i] for i in pending])))
+
+                for repair in range(self.REPAIR_ATTEMPTS + 1):
+                    broken: Dict[int, Tuple[str, Exception]] = {}
+                    for i, llm_output in llm_outputs.items():
+                        try:
+                            if isinstance(llm_output, Exception):
+                                raise llm_output
+                            output_data = self._extract_json(llm_output)
+                            results[i] = self._create_thoughts(output_data, thought_prefixes[i])
+                            # Solo le risposte valide vengono salvate, così i tentativi successivi
+                            # ad un errore interrogano di nuovo l'LLM
+                            if cache_keys[i] is not None:
+                                self.response_cache.set(cache_keys[i], llm_output)
+                        except Exception as e:
+                            last_error = e
+                            # Gli errori di invocazione non hanno una risposta da correggere
+                            if not isinstance(llm_output, Exception):
+                                broken[i] = (llm_output, e)
+
+                    if not broken or repair == self.REPAIR_ATTEMPTS:
+                        break
+                    repair_prompts = [self._repair_prompt(output, error) for output, error in broken.values()]
+                    llm_outputs = dict(zip(broken, self._invoke_llm_batch(repair_prompts)))
+
+                pending = [i for i in pending if results[i] is None]
+                if not pending:
+                    return results
+
+            raise ValueError(
+                f"Generazione fallita dopo {self.MAX_RETRIES} tentativi: {str(last_error)}"
+            )
+
+        except Exception as e:
+            error_msg = f"Errore nel nodo {self.node_id}: {str(e)}"
+            self.set_error(error_msg)
+            raise
+
+    def _retry_delay(self, attempt: int) -> float:
+        """Attesa in secondi prima del tentativo indicato (a partire da 1), con backoff esponenziale"""
+        return self.RETRY_BACKOFF * 2 ** (attempt - 1)
+
+    def generate_n(self, inputs: Dict[str, Thought], n: int,
+                   thought_prefixes: Optional[List[str]] = None) -> List[List[Thought]]:
+        """
+        Genera n campioni indipendenti per lo stesso insieme di input. Il prompt viene
+        costruito una sola volta e inviato n volte in un'unica richiesta batch: Ollama
+        non supporta il campionamento multiplo (n) in una sola chiamata, ma le richieste
+        con lo stesso prefisso riusano la sua cache del prompt.
+
+        Args:
+            inputs: Dizionario che mappa i nomi degli input ai rispettivi Thought
+            n: Numero di campioni da generare
+            thought_prefixes: Prefissi opzionali per gli id dei Thought di ciascun campione
+
+        Returns:
+            Lista degli output di ciascun campione
+
+        Raises:
+            ValueError: Se gli input non sono validi o se la generazione fallisce
+        """
+        return self.batch_process([inputs] * n, thought_prefixes)
+
+    def expected_output_tokens(self, inputs: Dict[str, Thought]) -> int:
+        """
+        Stima il numero di token della risposta, usata dallo scheduler per raggruppare
+        chiamate con output di lunghezza simile. Se il template usa un campo max_words
+        la stima deriva dal suo valore, altrimenti dalla dimensione dell'esempio JSON
+        mostrato nel formato dell'output.
+
+        Args:
+            inputs: Dizionario degli input del nodo
+
+        Returns:
+            Numero stimato di token dell'output
+        """
+        for input_name, field in _parse_template_variables(self._dynamic_suffix):
+            if field == "max_words" and input_name in inputs:
+                try:
+                    # Circa 4 token ogni 3 parole, più la struttura JSON
+                    return int(inputs[input_name].values[field]) * 4 // 3 + 16
+                except (KeyError, TypeError, ValueError):
+                    break
+
+        # Per output di cardinalità variabile si assumono alcuni elementi
+        items = self.output_cardinality if self.output_cardinality > 0 else 4
+        return items * len(_example_for(self.output_thoughts, False)) // 4
+
+    @staticmethod
+    def process_group(generators: List['GoTGenerator'], inputs_list: List[Dict[str, Thought]]) -> None:
+        """
+        Processa più generator, anche di classi diverse ma con la stessa configurazione
+        LLM, inviando tutti i prompt in un'unica richiesta batch. I generator la cui
+        risposta non è valida vengono riprocessati singolarmente con process.
+
+        Args:
+            generators: Generator da processare
+            inputs_list: Input di ciascun generator, nello stesso ordine
+        """
+        pending = []
+        prompts = []
+        for generator, inputs in zip(generators, inputs_list):
+            try:
+                generator._validate_inputs(inputs)
+                output_data = generator._deterministic_output(inputs)
+                if output_data is not None:
+                    generator.outputs = generator._create_thoughts(output_data)
+                else:
+                    prompts.append(generator._build_prompt(inputs))
+                    pending.append((generator, inputs))
+            except Exception as e:
+                generator.set_error(f"Errore nel nodo {generator.node_id}: {str(e)}")
+
+        if not prompts:
+            return
+
+        llm_outputs = generators[0]._invoke_llm_batch(prompts)
+        for (generator, inputs), llm_output in zip(pending, llm_outputs):
+            try:
+                if isinstance(llm_output, Exception):
+                    raise llm_output
+                output_data = generator._extract_json(llm_output)
+                generator.outputs = generator._create_thoughts(output_data)
+            except Exception:
+                try:
+                    generator.process(inputs)
+                except Exception:
+                    # L'errore è già registrato nel nodo da process
+                    pass
+
+    def _repair_prompt(self, llm_output: str, error: Exception) -> str:
+        """
+        Costruisce un prompt breve che chiede all'LLM di correggere una risposta non
+        valida, senza ripetere il task e i suoi input.
+
+        Args:
+            llm_output: Risposta non valida dell'LLM
+            error: Errore riscontrato nell'elaborazione della risposta
+
+        Returns:
+            Il prompt di riparazione
+        """
+        schema = _schema_for(self.output_thoughts, self.output_cardinality != 1)
+        return (
+            f"Fix the JSON below to match this schema: {schema}\n"
+            f"Error: {str(error)}\n"
+            "Return only the corrected JSON object, without additional text.\n\n"
+            f"{llm_output}"
+        )
+
+    def _cache_key(self, prompt: "PromptValue") -> Optional[str]:
         """
-        Invoca l'LLM con il template processato.
+        Calcola la chiave della cache delle risposte per un prompt.
+
+        Args:
+            prompt: Prompt costruito con _build_prompt
+
+        Returns:
+            La chiave, oppure None se la cache non è configurata o se la configurazione
+            non è deterministica (temperature > 0) e cache_nondeterministic è False
+        """
+        if self.response_cache is None:
+            return None
+        if self.llm_config.temperature != 0 and not self.cache_nondeterministic:
+            return None
+
+        config = self.llm_config
+        return make_key(
+            config.name, config.temperature, config.repeat_penalty, config.top_p, config.num_ctx,
+            prompt.to_string()
+        )
+
+    def _split_template(self, template: str) -> Tuple[str, str]:
+        """
+        Divide il template in un prefisso statico, identico ad ogni chiamata,
+        e in un suffisso che inizia dalla riga della prima variabile {input.field}.
+
+        Args:
+            template: Il template da dividere
+
+        Returns:
+            Tupla (prefisso statico, suffisso con le variabili)
+        """
+        match = _TEMPLATE_VAR_RE.search(template)
+        if match is None:
+            return template, ""
+        split_at = template.rfind("\n", 0, match.start()) + 1
+        return template[:split_at], template[split_at:]
+
+    def _build_prompt(self, inputs: Dict[str, Thought]) -> "PromptValue":
+        """
+        Costruisce il prompt per l'LLM. Il prefisso statico del template viene inviato
+        come messaggio di sistema, sempre identico, in modo che il backend possa
+        riusare la cache del prefisso (KV cache) tra chiamate successive; solo il
+        suffisso con le variabili sostituite cambia da una chiamata all'altra.
 
         Args:
             inputs: Dizionario che mappa i nomi degli input ai rispettivi Thought
 
         Returns:
-            Output dell'LLM
+            Prompt pronto per l'invocazione, senza variabili residue
         """
-        processed_template = self._process_template(self.template, inputs)
+        from langchain_core.messages import HumanMessage
+        from langchain_core.prompt_values import ChatPromptValue
 
-        #print("processed_template: ")
-        #print(processed_template)
+        messages = [self._system_message]
+        if self._dynamic_suffix:
+            variables = self._template_variables(self._dynamic_suffix, inputs)
+            messages.append(HumanMessage(content=self._suffix_template.substitute(variables)))
+        return ChatPromptValue(messages=messages)
 
-        prompt = ChatPromptTemplate.from_template(processed_template)
-        chain = prompt | self.llm | StrOutputParser()
-        return chain.invoke({})
+    def _invoke_llm_batch(self, prompts: List[Union["PromptValue", str]]) -> List[Any]:
+        """
+        Invoca l'LLM su più prompt con un'unica richiesta batch, limitando il numero
+        di richieste contemporanee a LLMConfig.max_concurrency. Con requests_per_minute
+        il batch parte quando il limitatore condiviso ha gettoni per tutti i prompt.
 
-    def _process_template(self, template: str, inputs: Dict[str, Thought]) -> str:
+        Args:
+            prompts: Prompt costruiti con _build_prompt o _repair_prompt
+
+        Returns:
+            Output dell'LLM per ciascun prompt, oppure l'eccezione sollevata
         """
-        Processa il template sostituendo le variabili con i valori formattati dai Thought.
+        limiter = _get_rate_limiter(self.llm_config)
+        if limiter is not None:
+            time.sleep(limiter.reserve(len(prompts)))
+        return self.llm.batch(
+            prompts,
+            config={"max_concurrency": self.llm_config.max_concurrency},
+            return_exceptions=True
+        )
+
+    def _template_variables(self, template: str, inputs: Dict[str, Thought]) -> Dict[str, str]:
+        """
+        Calcola i valori delle variabili del template a partire dai Thought di input.
         Le variabili del template devono corrispondere ai nomi definiti nel mapping.
 
         Args:
@@ -307,7 +888,8 @@ class GoTGenerator(GoTNode):
             inputs: Dizionario che mappa i nomi degli input ai rispettivi Thought
 
         Returns:
-            Template con tutte le variabili sostituite
+            Dizionario che associa ad ogni variabile {input.field}, con nome input__field,
+            il valore formattato dal Thought corrispondente
 
         Raises:
             ValueError: Se una variabile del template non può essere risolta
@@ -316,14 +898,8 @@ class GoTGenerator(GoTNode):
         # Ottiene i nomi logici definiti nel mapping
         declared_inputs = set(self.mapping.keys())
 
-        pattern = r'\{(\w+)\.(\w+)\}'
-        matches = re.finditer(pattern, template)
-
-        # Prepara le sostituzioni
-        replacements = {}
-        for match in matches:
-            input_name, field = match.groups()
-
+        variables = {}
+        for input_name, field in _parse_template_variables(template):
             # Verifica che il nome dell'input sia definito nel mapping
             if input_name not in declared_inputs:
                 raise ValueError(
@@ -341,30 +917,10 @@ class GoTGenerator(GoTNode):
 
             thought = inputs[input_name]
             try:
-                value = thought.get_for_template(field)
-                replacements[f"{{{input_name}.{field}}}"] = value
+                variables[f"{input_name}__{field}"] = thought.get_for_template(field)
             except KeyError as e:
                 raise ValueError(
                     f"Errore nell'elaborazione della variabile {input_name}.{field}: {str(e)}"
                 )
 
-        # Applica tutte le sostituzioni
-        result = template
-        for var, value in replacements.items():
-            result = result.replace(var, value)
-
-        return result
-
-    def _extract_template_variables(self, template: str) -> Set[Tuple[str, str]]:
-        """
-        Estrae tutte le variabili del template nella forma {input.field}.
-
-        Args:
-            template: Il template da processare
-
-        Returns:
-            Set di tuple (input_id, field_name) per ogni variabile trovata
-        """
-        pattern = r'\{(\w+)\.(\w+)\}'
-        matches = re.finditer(pattern, template)
-        return {(match.group(1), match.group(2)) for match in matches}
+        return variables
@@ -1,15 +1,35 @@
-from typing import Dict, List, Any, Optional, Type
+from typing import Dict, List, Optional, Tuple, Type, Union
 from abc import abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
 
 from src.got.node import GoTNode, LLMConfig
 from src.got.thought import Thought
 
+# Funzioni che riducono gli score di un Thought ad un unico valore (vedi score_reduction)
+_SCORE_REDUCTIONS = {"sum": sum, "max": max}
+
 class GoTKeepBest(GoTNode):
     """
     Nodo che seleziona il migliore tra più Thought dello stesso tipo
     basandosi su una funzione di scoring personalizzabile.
     """
 
+    # Numero di thread usati per calcolare gli score dei candidati. Con 1 gli score
+    # sono calcolati in sequenza; valori maggiori sono utili quando _assign_scores
+    # è costoso e rilascia il GIL (es. scoring tramite LLM o NumPy su array grandi)
+    SCORING_WORKERS = 1
+
+    # Chiavi restituite da _assign_scores, in ordine di priorità. Se dichiarate, il migliore
+    # viene scelto con un confronto lessicografico vettoriale (a parità di chiavi precedenti
+    # vince lo score più alto della chiave successiva) invece che con _compare
+    score_keys: Optional[Tuple[str, ...]] = None
+
+    # Se "sum" o "max", gli score di ogni candidato vengono ridotti ad un unico valore
+    # e vince il valore più alto, senza confronti a coppie con _compare
+    score_reduction: Optional[str] = None
+
     def __init__(self, node_id: str, llm_config: LLMConfig):
         """
         Inizializza il nodo GoTKeepBest.
@@ -19,7 +39,9 @@ class GoTKeepBest(GoTNode):
             llm_config: Configurazione LLM (opzionale per questo nodo)
         """
         super().__init__(node_id, llm_config)
-        self._scored_items: List[Dict[str, Any]] = []
+        # Candidati valutati e relativi score, in liste parallele
+        self._thoughts: List[Thought] = []
+        self._scores: List[Dict[str, float]] = []
 
     @property
     @abstractmethod
@@ -71,40 +93,112 @@ class GoTKeepBest(GoTNode):
         """
         pass
 
-    def process(self, inputs: Dict[str, Thought]) -> None:
+    def _is_perfect(self, scores: Dict[str, float]) -> bool:
+        """
+        Indica se un set di punteggi è il massimo ottenibile, nel qual caso
+        i candidati successivi non vengono valutati.
+
+        Args:
+            scores: Punteggi assegnati ad un Thought
+
+        Returns:
+            bool: True se nessun altro Thought può risultare migliore
+        """
+        return False
+
+    def _best_index(self) -> int:
+        """
+        Restituisce l'indice del miglior candidato tra quelli valutati.
+        A parità di score prevale il candidato che precede negli input.
+        """
+        if self.score_reduction is not None:
+            reduce = _SCORE_REDUCTIONS.get(self.score_reduction)
+            if reduce is None:
+                raise ValueError(
+                    f"score_reduction '{self.score_reduction}' non valida. "
+                    f"Valori ammessi: {sorted(_SCORE_REDUCTIONS)}"
+                )
+            scalars = [reduce(scores.values()) for scores in self._scores]
+            # max restituisce il primo indice con il valore massimo
+            return max(range(len(scalars)), key=scalars.__getitem__)
+
+        if self.score_keys is not None:
+            matrix = np.asarray(
+                [[scores[key] for key in self.score_keys] for scores in self._scores],
+                dtype=np.float64
+            )
+            # lexsort ordina per l'ultima chiave fornita ed è stabile: negando gli score
+            # il primo elemento è il migliore, e tra pari il primo negli input
+            order = np.lexsort([-matrix[:, j] for j in reversed(range(matrix.shape[1]))])
+            return int(order[0])
+
+        # Trova il migliore confrontando gli score
+        best = 0
+        for i in range(1, len(self._scores)):
+            if self._compare(self._scores[i], self._scores[best]) > 0:
+                best = i
+        return best
+
+    def is_perfect(self, thought: Thought) -> bool:
+        """
+        Indica se un Thought ottiene il punteggio massimo. Può essere usato come
+        condizione di arresto di un GoTRepeat che alimenta questo nodo.
+
+        Args:
+            thought: Il Thought da valutare
+
+        Returns:
+            bool: True se nessun altro Thought può risultare migliore
+        """
+        return self._is_perfect(self._assign_scores(thought))
+
+    def process(self, inputs: Union[List[Thought], Dict[str, Thought]]) -> None:
         """
         Processa gli input calcolando gli score e selezionando il migliore.
 
         Args:
-            inputs: Dizionario di Thought da processare
+            inputs: Lista dei Thought candidati (è accettato anche un dizionario,
+                di cui vengono considerati i valori)
         """
         try:
+            candidates = list(inputs.values()) if isinstance(inputs, dict) else inputs
+
+            # Con più worker gli score vengono calcolati in parallelo, ma raccolti
+            # comunque nell'ordine degli input così che la selezione sia deterministica
+            executor: Optional[ThreadPoolExecutor] = None
+            futures: List[Future] = []
+            if self.SCORING_WORKERS > 1 and len(candidates) > 1:
+                executor = ThreadPoolExecutor(max_workers=min(self.SCORING_WORKERS, len(candidates)))
+                futures = [executor.submit(self._assign_scores, thought) for thought in candidates]
+
             # Calcola gli score per ogni input
-            self._scored_items = []
-            for thought_id, thought in inputs.items():
-                try:
-                    scores = self._assign_scores(thought)
-                    self._scored_items.append({
-                        "thought": thought,
-                        "scores": scores
-                    })
-                except Exception as e:
-                    self.set_error(f"Error scoring thought {thought_id}: {str(e)}")
-                    return
-
-            if not self._scored_items:
+            self._thoughts = []
+            self._scores = []
+            try:
+                for i, thought in enumerate(candidates):
+                    try:
+                        if futures:
+                            scores = futures[i].result()
+                        else:
+                            scores = self._assign_scores(thought)
+                        self._thoughts.append(thought)
+                        self._scores.append(scores)
+                    except Exception as e:
+                        self.set_error(f"Error scoring thought {i} ({thought.thought_id}): {str(e)}")
+                        return
+
+                    if self._is_perfect(scores):
+                        break
+            finally:
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+
+            if not self._thoughts:
                 self.set_error("No valid scored items found")
                 return
 
-            # Trova il migliore confrontando gli score
-            best_item = self._scored_items[0]
-            for item in self._scored_items[1:]:
-                comparison = self._compare(item["scores"], best_item["scores"])
-                if comparison > 0:
-                    best_item = item
-
             # Imposta l'output come il thought migliore
-            self.outputs = [best_item["thought"]]
+            self.outputs = [self._thoughts[self._best_index()]]
 
         except Exception as e:
             error_msg = f"Error in {self.node_id}: {str(e)}"
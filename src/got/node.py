@@ -1,28 +1,134 @@
-from typing import Dict, List, Any, Optional, Type
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Any, Optional, Type
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
-import json
-from jsonschema import validate, ValidationError
-from langchain_community.llms import Ollama
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+import asyncio
+import threading
+import time
+import weakref
 
 from src.got.thought import Thought
+from src.got.cache import CacheBackend
 
-@dataclass
+# LangChain è importato solo quando serve un client, per non rallentare
+# il caricamento dei moduli che usano soltanto i Thought o la configurazione
+if TYPE_CHECKING:
+    from langchain_community.llms import Ollama
+
+@dataclass(frozen=True)
 class LLMConfig:
-    """Configurazione del modello LLM"""
+    """Configurazione del modello LLM (immutabile, usabile come chiave di dizionario)"""
     name: str
     temperature: float = 0.1
     repeat_penalty: float = 1.2
     top_p: float = 0.9
     num_ctx: int = 4096
+    # Numero massimo di prompt inviati contemporaneamente in un batch (None = nessun limite)
+    max_concurrency: Optional[int] = None
+    # Durata per cui Ollama mantiene il modello (e la cache del prefisso) in memoria, es. "30m"
+    keep_alive: Optional[str] = None
+    # Se True Ollama vincola il modello a produrre JSON valido (format="json")
+    json_mode: bool = True
+    # Numero massimo di richieste avviate al minuto verso il modello (None = nessun limite)
+    requests_per_minute: Optional[int] = None
+
+# Client Ollama condivisi dai nodi con la stessa configurazione
+_CLIENT_POOL: Dict[LLMConfig, "Ollama"] = {}
+
+def _get_client(llm_config: LLMConfig) -> "Ollama":
+    """Restituisce il client Ollama per la configurazione, creandolo al primo utilizzo"""
+    client = _CLIENT_POOL.get(llm_config)
+    if client is None:
+        from langchain_community.llms import Ollama
+
+        client = _CLIENT_POOL.setdefault(llm_config, Ollama(
+            model=llm_config.name,
+            temperature=llm_config.temperature,
+            repeat_penalty=llm_config.repeat_penalty,
+            top_p=llm_config.top_p,
+            num_ctx=llm_config.num_ctx,
+            keep_alive=llm_config.keep_alive,
+            format="json" if llm_config.json_mode else None,
+        ))
+    return client
+
+
+class _TokenBucket:
+    """
+    Limitatore di frequenza a secchio di gettoni, condiviso tra thread ed event loop.
+    Il secchio si riempie di requests_per_minute gettoni al minuto, fino ad una
+    capacità pari al numero di richieste che possono partire insieme.
+    """
+
+    def __init__(self, requests_per_minute: int, capacity: int):
+        self._rate = requests_per_minute / 60.0
+        self._capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, count: int = 1) -> float:
+        """
+        Prenota i gettoni per count richieste.
+
+        Args:
+            count: Numero di richieste da avviare
+
+        Returns:
+            Secondi da attendere prima di avviare le richieste
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            # Il saldo può diventare negativo: le prenotazioni successive attendono in coda
+            self._tokens -= count
+            return max(0.0, -self._tokens / self._rate)
+
+
+# Limitatori di frequenza condivisi dai nodi con la stessa configurazione
+_RATE_LIMITERS: Dict[LLMConfig, _TokenBucket] = {}
+# Semafori delle richieste in corso, per event loop e configurazione: un semaforo
+# asyncio è legato al loop in cui viene usato
+_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[LLMConfig, asyncio.Semaphore]]" = \
+    weakref.WeakKeyDictionary()
+_LIMITERS_LOCK = threading.Lock()
+
+def _get_rate_limiter(llm_config: LLMConfig) -> Optional[_TokenBucket]:
+    """Restituisce il limitatore di frequenza della configurazione, se previsto"""
+    if llm_config.requests_per_minute is None:
+        return None
+    limiter = _RATE_LIMITERS.get(llm_config)
+    if limiter is None:
+        with _LIMITERS_LOCK:
+            limiter = _RATE_LIMITERS.setdefault(llm_config, _TokenBucket(
+                llm_config.requests_per_minute, llm_config.max_concurrency or 1
+            ))
+    return limiter
+
+def _get_semaphore(llm_config: LLMConfig) -> Optional[asyncio.Semaphore]:
+    """Restituisce il semaforo della configurazione nel loop corrente, se previsto"""
+    if llm_config.max_concurrency is None:
+        return None
+    semaphores = _SEMAPHORES.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(llm_config)
+    if semaphore is None:
+        semaphore = semaphores.setdefault(llm_config, asyncio.Semaphore(llm_config.max_concurrency))
+    return semaphore
 
 class GoTNode(ABC):
     """Nodo base astratto per Graph of Thoughts"""
 
     MAX_RETRIES = 3
 
+    # Cache opzionale delle risposte dell'LLM, usata solo con temperature == 0
+    response_cache: Optional[CacheBackend] = None
+    # Se True la cache delle risposte viene usata anche con temperature > 0
+    cache_nondeterministic: bool = False
+    # Se True GraphOfOperations riusa gli output del nodo per input già visti;
+    # i nodi di cui si vogliono campioni sempre nuovi possono disattivarlo
+    cacheable: bool = True
+
     def __init__(self, node_id: str, llm_config: LLMConfig):
         self.node_id = node_id
         self.llm_config = llm_config
@@ -31,13 +137,7 @@ class GoTNode(ABC):
         self._error_message: Optional[str] = None
 
         if llm_config:
-            self.llm = Ollama(
-                model=self.llm_config.name,
-                temperature=self.llm_config.temperature,
-                repeat_penalty=self.llm_config.repeat_penalty,
-                top_p=self.llm_config.top_p,
-                num_ctx=self.llm_config.num_ctx,
-            )
+            self.llm = _get_client(llm_config)
 
     @property
     @abstractmethod
@@ -67,6 +167,36 @@ class GoTNode(ABC):
     def process(self, inputs: Dict[str, Thought]) -> None:
         pass
 
+    async def aprocess(self, inputs: Dict[str, Thought]) -> None:
+        """
+        Versione asincrona di process, usata dallo scheduler per eseguire in concorrenza
+        i nodi indipendenti. Di default esegue process in un thread separato; i nodi
+        che invocano l'LLM possono ridefinirla con chiamate native asincrone.
+
+        Args:
+            inputs: Dizionario degli input del nodo
+        """
+        await asyncio.to_thread(self.process, inputs)
+
+    @asynccontextmanager
+    async def _llm_slot(self) -> AsyncIterator[None]:
+        """
+        Attende che una richiesta all'LLM possa partire: al più max_concurrency richieste
+        asincrone in corso per configurazione, avviate al ritmo di requests_per_minute.
+        Le richieste di tutti i nodi con la stessa configurazione condividono i limiti.
+        """
+        semaphore = _get_semaphore(self.llm_config)
+        if semaphore is not None:
+            await semaphore.acquire()
+        try:
+            limiter = _get_rate_limiter(self.llm_config)
+            if limiter is not None:
+                await asyncio.sleep(limiter.reserve())
+            yield
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
     @property
     def outputs(self) -> List[Thought]:
         """Getter per i Thought di output prodotti"""
@@ -99,3 +229,9 @@ class GoTNode(ABC):
         self._has_error = True
         self._error_message = message
         self._outputs = []  # Pulisce gli output in caso di errore
+
+    def reset(self) -> None:
+        """Riporta il nodo allo stato iniziale, senza output né errori"""
+        self._outputs = []
+        self._has_error = False
+        self._error_message = None
@@ -1,5 +1,8 @@
-from typing import Dict, List, Any, Optional, Type
+from typing import Callable, Dict, List, Any, Optional, Tuple, Type
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import copy
 
 from src.got.node import GoTNode, LLMConfig
 from src.got.generator import GoTGenerator
@@ -11,7 +14,12 @@ class GoTRepeat(GoTNode):
     Utile per generare diverse varianti partendo dallo stesso input.
     """
 
-    def __init__(self, node_id: str, llm_config: LLMConfig, embedded_generator: GoTGenerator, k: int):
+    # Lo scopo del nodo è ottenere campioni diversi: GraphOfOperations non ne riusa gli output
+    cacheable: bool = False
+
+    def __init__(self, node_id: str, llm_config: LLMConfig, embedded_generator: GoTGenerator, k: int,
+                 batch: bool = True, should_stop: Optional[Callable[[Thought], bool]] = None,
+                 max_workers: Optional[int] = None):
         """
         Inizializza un nodo GoTRepeat.
 
@@ -20,14 +28,29 @@ class GoTRepeat(GoTNode):
             llm_config: Configurazione del modello LLM
             embedded_generator: Istanza del generator da ripetere
             k: Numero di ripetizioni da eseguire
+            batch: Se True le k richieste vengono inviate all'LLM in un unico batch
+            should_stop: Predicato valutato sugli output di ogni generazione; se restituisce
+                True per almeno un Thought le ripetizioni rimanenti vengono saltate
+            max_workers: Numero massimo di ripetizioni eseguite in parallelo quando
+                batch è False (default: k)
         """
         super().__init__(node_id, llm_config)
         self.embedded_generator = embedded_generator
         self.k = k
+        self.batch = batch
+        self.should_stop = should_stop
+        self.max_workers = max_workers if max_workers is not None else k
 
         # Valida k
         if k <= 0:
             raise ValueError("k must be positive")
+        if self.max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+
+        # Con cardinalità fissa del generator la cardinalità degli output è nota
+        # già alla costruzione; None se dipende dagli output effettivi
+        base_cardinality = embedded_generator.output_cardinality
+        self._output_cardinality: Optional[int] = k * base_cardinality if base_cardinality > 0 else None
 
     @property
     def input_thoughts(self) -> List[Type[Thought]]:
@@ -42,15 +65,17 @@ class GoTRepeat(GoTNode):
     @property
     def output_cardinality(self) -> int:
         """
-        Cardinalità degli output. Per GoTRepeat è sempre k * generator_cardinality.
+        Cardinalità degli output, pari a k * generator_cardinality.
         Se il generator produce un singolo output, GoTRepeat ne produrrà k.
         Se il generator produce n output, GoTRepeat ne produrrà k*n.
+        Con una condizione di arresto il numero di output dipende da quante ripetizioni
+        vengono eseguite, quindi la cardinalità è variabile (-1).
         """
-        base_cardinality = (
-            1 if self.embedded_generator.output_cardinality == 1
-            else len(self.embedded_generator.outputs)
-        )
-        return self.k * base_cardinality
+        if self.should_stop is not None:
+            return -1
+        if self._output_cardinality is not None:
+            return self._output_cardinality
+        return self.k * len(self.embedded_generator.outputs)
 
     def process(self, inputs: Dict[str, Thought]) -> None:
         """
@@ -59,31 +84,262 @@ class GoTRepeat(GoTNode):
         Args:
             inputs: Dizionario degli input per il generator
         """
-        try:
-            all_outputs = []
+        if self.batch:
+            GoTRepeat.process_group([self], [inputs])
+            return
 
-            for i in range(self.k):
-                # Clona il generator per ogni iterazione per evitare interferenze
-                iteration_generator = type(self.embedded_generator)(
-                    f"{self.node_id}_iter_{i}",
-                    self.llm_config
-                )
+        try:
+            # Un generator riusato non deve conservare l'errore di un'esecuzione precedente
+            self.embedded_generator.reset()
 
-                # Processa gli input con il generator clonato
-                iteration_generator.process(inputs)
+            # Con cardinalità nota del generator la lista degli output viene allocata
+            # una sola volta e ogni ripetizione scrive nella propria porzione
+            per_iteration = self.embedded_generator.output_cardinality
+            all_outputs: List[Optional[Thought]] = (
+                [None] * (self.k * per_iteration) if per_iteration > 0 else []
+            )
 
-                if iteration_generator.has_error:
-                    raise ValueError(
-                        f"Embedded generator failed at iteration {i}: "
-                        f"{iteration_generator.error_message}"
-                    )
+            # Con una condizione di arresto si attende il primo campione prima di
+            # richiedere le ripetizioni rimanenti
+            first = 1 if self.should_stop is not None else self.k
+            self._run_iterations(inputs, range(first), all_outputs)
+            completed = first
 
-                # Aggiungi gli output di questa iterazione
-                all_outputs.extend(iteration_generator.outputs)
+            first_outputs = all_outputs[:first * per_iteration] if per_iteration > 0 else all_outputs
+            if first < self.k and not self._goal_reached(first_outputs):
+                self._run_iterations(inputs, range(first, self.k), all_outputs)
+                completed = self.k
 
             # Assegna tutti gli output generati
+            if per_iteration > 0 and completed < self.k:
+                all_outputs = all_outputs[:completed * per_iteration]
+            self.outputs = all_outputs
+
+        except Exception as e:
+            error_msg = f"Error in {self.node_id}: {str(e)}"
+            self.set_error(error_msg)
+
+    async def aprocess(self, inputs: Dict[str, Thought]) -> None:
+        """
+        Versione asincrona di process. Senza batch le ripetizioni sono coroutine
+        concorrenti del generator embedded, al più max_workers alla volta, invece
+        di un thread per ripetizione; con batch attivo la chiamata batch sincrona
+        viene eseguita in un thread separato.
+
+        Args:
+            inputs: Dizionario degli input per il generator
+        """
+        if self.batch:
+            await super().aprocess(inputs)
+            return
+
+        try:
+            self.embedded_generator.reset()
+
+            # Con una condizione di arresto si attende il primo campione prima di
+            # richiedere le ripetizioni rimanenti
+            first = 1 if self.should_stop is not None else self.k
+            all_outputs = await self._arun_iterations(inputs, range(first))
+            if first < self.k and not self._goal_reached(all_outputs):
+                all_outputs.extend(await self._arun_iterations(inputs, range(first, self.k)))
             self.outputs = all_outputs
 
         except Exception as e:
             error_msg = f"Error in {self.node_id}: {str(e)}"
             self.set_error(error_msg)
+
+    async def _arun_iterations(self, inputs: Dict[str, Thought], iterations: range) -> List[Thought]:
+        """
+        Esegue più ripetizioni in concorrenza, ognuna con un clone del generator embedded.
+
+        Args:
+            inputs: Dizionario degli input per il generator
+            iterations: Numeri delle ripetizioni da eseguire
+
+        Returns:
+            Gli output delle ripetizioni, nell'ordine delle ripetizioni
+
+        Raises:
+            ValueError: Se il generator fallisce o produce un numero inatteso di output
+        """
+        per_iteration = self.embedded_generator.output_cardinality
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def run(i: int) -> List[Thought]:
+            # aprocess salva gli output nel generator, quindi ogni ripetizione usa un clone
+            iteration_generator = copy.copy(self.embedded_generator)
+            iteration_generator.node_id = f"{self.node_id}_iter_{i}"
+            iteration_generator.reset()
+
+            async with semaphore:
+                await iteration_generator.aprocess(inputs)
+
+            if iteration_generator.has_error:
+                raise ValueError(
+                    f"Embedded generator failed at iteration {i}: "
+                    f"{iteration_generator.error_message}"
+                )
+            outputs = iteration_generator.outputs
+            if per_iteration > 0 and len(outputs) != per_iteration:
+                raise ValueError(
+                    f"Embedded generator produced {len(outputs)} outputs at iteration {i}, "
+                    f"expected {per_iteration}"
+                )
+            return outputs
+
+        results = await asyncio.gather(*(run(i) for i in iterations))
+        return [thought for outputs in results for thought in outputs]
+
+    def _run_iteration(self, inputs: Dict[str, Thought], i: int) -> List[Thought]:
+        """
+        Esegue una ripetizione con il generator embedded, se dichiarato stateless,
+        oppure con un suo clone.
+
+        Args:
+            inputs: Dizionario degli input per il generator
+            i: Numero della ripetizione
+
+        Returns:
+            Gli output prodotti dalla ripetizione
+
+        Raises:
+            ValueError: Se il generator fallisce
+        """
+        if getattr(self.embedded_generator, "stateless", False):
+            # batch_process restituisce gli output senza salvarli nel generator,
+            # quindi le ripetizioni possono condividerlo anche in parallelo
+            try:
+                return self.embedded_generator.batch_process([inputs], [f"{self.node_id}_iter_{i}"])[0]
+            except Exception as e:
+                raise ValueError(f"Embedded generator failed at iteration {i}: {str(e)}")
+
+        # Clona il generator per ogni iterazione per evitare interferenze: la copia
+        # superficiale evita di rieseguire __init__ e condivide client e template,
+        # mentre output ed errore vengono azzerati
+        iteration_generator = copy.copy(self.embedded_generator)
+        iteration_generator.node_id = f"{self.node_id}_iter_{i}"
+        iteration_generator.reset()
+
+        # Processa gli input con il generator clonato
+        iteration_generator.process(inputs)
+
+        if iteration_generator.has_error:
+            raise ValueError(
+                f"Embedded generator failed at iteration {i}: "
+                f"{iteration_generator.error_message}"
+            )
+        return iteration_generator.outputs
+
+    def _run_iterations(self, inputs: Dict[str, Thought], iterations: range,
+                        all_outputs: List[Optional[Thought]]) -> None:
+        """
+        Esegue più ripetizioni in parallelo, al più max_workers alla volta.
+        Con cardinalità nota del generator ogni ripetizione scrive i propri output nella
+        sua porzione di all_outputs, preallocata dal chiamante, senza bisogno di lock;
+        altrimenti gli output vengono accodati nell'ordine delle ripetizioni.
+
+        Args:
+            inputs: Dizionario degli input per il generator
+            iterations: Numeri delle ripetizioni da eseguire
+            all_outputs: Lista degli output di tutte le ripetizioni
+        """
+        per_iteration = self.embedded_generator.output_cardinality
+
+        def run(i: int) -> List[Thought]:
+            outputs = self._run_iteration(inputs, i)
+            if per_iteration > 0:
+                if len(outputs) != per_iteration:
+                    raise ValueError(
+                        f"Embedded generator produced {len(outputs)} outputs at iteration {i}, "
+                        f"expected {per_iteration}"
+                    )
+                all_outputs[i * per_iteration:(i + 1) * per_iteration] = outputs
+            return outputs
+
+        if len(iterations) == 1:
+            results = [run(iterations[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(iterations), self.max_workers)) as executor:
+                results = [future.result() for future in [executor.submit(run, i) for i in iterations]]
+
+        if per_iteration <= 0:
+            for outputs in results:
+                all_outputs.extend(outputs)
+
+    def _goal_reached(self, thoughts: List[Thought]) -> bool:
+        """Indica se almeno uno dei Thought generati soddisfa la condizione di arresto"""
+        return self.should_stop is not None and any(self.should_stop(t) for t in thoughts)
+
+    def can_batch_with(self, other: 'GoTRepeat') -> bool:
+        """
+        Indica se questo nodo può essere processato in batch insieme ad un altro GoTRepeat,
+        ovvero se entrambi ripetono lo stesso tipo di generator con la stessa configurazione.
+        Conta la configurazione dei generator embedded, che eseguono effettivamente il batch.
+        """
+        return (
+            self.batch and other.batch
+            and type(self.embedded_generator) is type(other.embedded_generator)
+            and self.embedded_generator.llm_config == other.embedded_generator.llm_config
+        )
+
+    @staticmethod
+    def process_group(repeaters: List['GoTRepeat'], inputs_list: List[Dict[str, Thought]]) -> None:
+        """
+        Processa più GoTRepeat compatibili inviando tutte le richieste
+        in un'unica chiamata batch al generator embedded del primo nodo.
+
+        I nodi con una condizione di arresto ricevono prima un solo campione; le
+        ripetizioni rimanenti vengono richieste in un secondo batch solo per i nodi
+        la cui condizione non è stata soddisfatta.
+
+        Args:
+            repeaters: Nodi GoTRepeat compatibili tra loro (vedi can_batch_with)
+            inputs_list: Input di ciascun nodo, nello stesso ordine di repeaters
+        """
+        collected: List[List[Thought]] = [[] for _ in repeaters]
+
+        try:
+            first_round = [
+                (idx, i)
+                for idx, repeater in enumerate(repeaters)
+                for i in range(1 if repeater.should_stop is not None else repeater.k)
+            ]
+            GoTRepeat._run_batch(repeaters, inputs_list, first_round, collected)
+
+            second_round = [
+                (idx, i)
+                for idx, repeater in enumerate(repeaters)
+                if repeater.should_stop is not None and not repeater._goal_reached(collected[idx])
+                for i in range(1, repeater.k)
+            ]
+            if second_round:
+                GoTRepeat._run_batch(repeaters, inputs_list, second_round, collected)
+        except Exception as e:
+            for repeater in repeaters:
+                repeater.set_error(f"Error in {repeater.node_id}: {str(e)}")
+            return
+
+        for repeater, outputs in zip(repeaters, collected):
+            repeater.outputs = outputs
+
+    @staticmethod
+    def _run_batch(repeaters: List['GoTRepeat'], inputs_list: List[Dict[str, Thought]],
+                   requests: List[Tuple[int, int]], collected: List[List[Thought]]) -> None:
+        """
+        Esegue un batch di iterazioni e accoda gli output ai rispettivi nodi.
+
+        Args:
+            repeaters: Nodi GoTRepeat del gruppo
+            inputs_list: Input di ciascun nodo
+            requests: Coppie (indice del nodo, numero di iterazione) da eseguire
+            collected: Output accumulati per ciascun nodo
+        """
+        generator = repeaters[0].embedded_generator
+        prefixes = [f"{repeaters[idx].node_id}_iter_{i}" for idx, i in requests]
+        if len(repeaters) == 1:
+            # Le ripetizioni di un solo nodo condividono lo stesso prompt
+            results = generator.generate_n(inputs_list[0], len(requests), prefixes)
+        else:
+            results = generator.batch_process([inputs_list[idx] for idx, _ in requests], prefixes)
+        for (idx, _), iteration_outputs in zip(requests, results):
+            collected[idx].extend(iteration_outputs)
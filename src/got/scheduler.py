@@ -0,0 +1,68 @@
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+from collections import defaultdict
+import asyncio
+import bisect
+
+
+# Limiti superiori (in token) dei gruppi di chiamate con lunghezza dell'output simile
+OUTPUT_TOKEN_BINS = (64, 256, 1024)
+
+
+def token_bin(expected_tokens: int) -> int:
+    """
+    Restituisce l'indice del gruppo di lunghezza a cui appartiene una chiamata:
+    0 per [0, 64), 1 per [64, 256), 2 per [256, 1024), 3 oltre.
+
+    Args:
+        expected_tokens: Numero stimato di token della risposta
+    """
+    return bisect.bisect_right(OUTPUT_TOKEN_BINS, expected_tokens)
+
+
+async def run_levels(levels: Iterable[List[str]],
+                     run_node: Callable[[str], Awaitable[None]],
+                     group_by: Optional[Callable[[str], Optional[Hashable]]] = None,
+                     run_group: Optional[Callable[[List[str]], Awaitable[None]]] = None) -> None:
+    """
+    Esegue i nodi di un DAG livello per livello, a partire dai livelli già calcolati
+    (ad esempio il piano di esecuzione di un grafo compilato una sola volta): i nodi di
+    ogni livello vengono eseguiti in concorrenza, così che le latenze dei nodi
+    indipendenti si sovrappongano invece di sommarsi, e ogni livello attende il
+    completamento del precedente.
+
+    Se group_by e run_group sono indicati, i nodi di un livello con la stessa chiave
+    (diversa da None) vengono eseguiti insieme da run_group, ad esempio con un'unica
+    richiesta batch per nodi con output di lunghezza simile.
+
+    Args:
+        levels: Livelli in ordine topologico, ognuno con gli ID dei suoi nodi
+        run_node: Coroutine che esegue il nodo con l'ID indicato
+        group_by: Funzione che associa ad un nodo la chiave del suo gruppo, o None
+        run_group: Coroutine che esegue insieme i nodi di un gruppo
+    """
+    for level in levels:
+        await asyncio.gather(*_schedule_level(level, run_node, group_by, run_group))
+
+
+def _schedule_level(ready: List[str], run_node: Callable[[str], Awaitable[None]],
+                    group_by: Optional[Callable[[str], Optional[Hashable]]],
+                    run_group: Optional[Callable[[List[str]], Awaitable[None]]]) -> List[Awaitable[None]]:
+    """Crea le coroutine di un livello, raggruppando i nodi con la stessa chiave"""
+    if group_by is None or run_group is None:
+        return [run_node(node_id) for node_id in ready]
+
+    coroutines = []
+    groups: Dict[Hashable, List[str]] = defaultdict(list)
+    for node_id in ready:
+        key = group_by(node_id)
+        if key is None:
+            coroutines.append(run_node(node_id))
+        else:
+            groups[key].append(node_id)
+
+    for group in groups.values():
+        if len(group) == 1:
+            coroutines.append(run_node(group[0]))
+        else:
+            coroutines.append(run_group(group))
+    return coroutines
@@ -1,33 +1,66 @@
-from typing import Dict, Any, Optional, List
-from abc import ABC, abstractmethod
-import json
-from jsonschema import validate, ValidationError
+from typing import Dict, Any, Optional, Callable, Mapping, ClassVar
+from types import MappingProxyType
+from jsonschema import ValidationError
+from jsonschema.exceptions import best_match
+from jsonschema.protocols import Validator
+from jsonschema.validators import validator_for
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
 
 class Thought:
     """
     Classe base che rappresenta un'unità di informazione (thought) nel grafo.
     Contiene un dizionario di valori e uno schema per la loro validazione.
     """
+    # Niente __dict__ per istanza: le sottoclassi dichiarano i propri slot (anche vuoti)
+    __slots__ = ("thought_id", "_values", "_template_cache")
+
+    # Schema JSON che definisce la struttura attesa dei valori (sola lettura),
+    # definito da ogni sottoclasse come attributo di classe
+    schema: ClassVar[Mapping[str, Any]]
+
+    # Funzioni di formattazione dei campi per il template, per nome del campo
+    _GETTERS: ClassVar[Mapping[str, Callable[[Dict[str, Any]], str]]] = {}
+
     def __init__(self, thought_id: str, values: Optional[Dict[str, Any]] = None):
         self.thought_id = thought_id
         self._values = values or {}
+        # Rappresentazioni formattate per il template, calcolate al primo accesso
+        self._template_cache: Dict[str, str] = {}
 
-    @property
-    @abstractmethod
-    def schema(self) -> dict:
-        """Schema JSON che definisce la struttura attesa dei valori"""
-        pass
+    def __init_subclass__(cls, **kwargs):
+        """
+        Verifica che la sottoclasse definisca lo schema e compila il validatore
+        fastjsonschema, così che il costo della compilazione sia pagato all'import
+        e non alla prima validazione.
+
+        Raises:
+            TypeError: Se la sottoclasse non definisce l'attributo di classe schema
+        """
+        super().__init_subclass__(**kwargs)
+        if not isinstance(getattr(cls, "schema", None), Mapping):
+            raise TypeError(
+                f"La classe {cls.__name__} deve definire l'attributo di classe 'schema'"
+            )
+
+        if fastjsonschema is not None:
+            cls._compiled_validator = fastjsonschema.compile(dict(cls.schema))
 
     @property
     def values(self) -> Dict[str, Any]:
         """I valori contenuti nel thought"""
         return self._values
 
-    @abstractmethod
     def get_for_template(self, key: str) -> str:
         """
         Restituisce una rappresentazione formattata del valore per l'uso nei template.
-        Ogni sottoclasse deve implementare la propria logica di formattazione.
+        La rappresentazione viene calcolata da _format_for_template una sola volta
+        per campo e riusata finché i valori non vengono sostituiti, così che i nodi
+        che leggono più volte lo stesso Thought (ad esempio le k ripetizioni di un
+        GoTRepeat) non la ricalcolino.
 
         Args:
             key: Chiave del valore da formattare
@@ -38,12 +71,59 @@ class Thought:
         Raises:
             KeyError: Se la chiave non esiste nei valori del thought
         """
-        pass
+        cached = self._template_cache.get(key)
+        if cached is None:
+            cached = self._format_for_template(key)
+            self._template_cache[key] = cached
+        return cached
+
+    def _format_for_template(self, key: str) -> str:
+        """
+        Formatta un campo per il template. Di default usa le funzioni di _GETTERS;
+        le sottoclassi possono ridefinirlo con la propria logica di formattazione.
+
+        Raises:
+            KeyError: Se la chiave non è valida per il thought
+        """
+        getter = self._GETTERS.get(key)
+        if getter is None:
+            raise KeyError(f"Campo '{key}' non valido per {type(self).__name__}")
+        return getter(self._values)
 
     @values.setter
     def values(self, new_values: Dict[str, Any]):
-        """Aggiorna i valori senza validazione"""
+        """Aggiorna i valori senza validazione, invalidando le rappresentazioni in cache"""
         self._values = new_values
+        self._template_cache = {}
+
+    def _get_validator(self) -> Optional[Callable[[Dict[str, Any]], Any]]:
+        """
+        Restituisce la funzione di validazione compilata con fastjsonschema per lo schema
+        della classe. Viene creata alla definizione della classe e condivisa da tutte
+        le istanze.
+
+        Returns:
+            Il validatore compilato, oppure None se fastjsonschema non è installato
+        """
+        if fastjsonschema is None:
+            return None
+        return type(self)._compiled_validator
+
+    def _get_jsonschema_validator(self) -> Validator:
+        """
+        Restituisce il validatore jsonschema (della draft dichiarata dallo schema, o
+        l'ultima disponibile) usato quando fastjsonschema non è installato. Lo schema
+        viene verificato e il validatore costruito una sola volta per classe.
+        """
+        cls = type(self)
+        validator = cls.__dict__.get("_jsonschema_validator")
+        if validator is None:
+            schema = dict(self.schema)
+            validator_cls = validator_for(schema)
+            validator_cls.check_schema(schema)
+            validator = validator_cls(schema)
+            cls._jsonschema_validator = validator
+        return validator
 
     def is_valid(self) -> bool:
         """
@@ -52,8 +132,16 @@ class Thought:
         Returns:
             bool: True se i valori sono validi, False altrimenti
         """
+        validator = self._get_validator()
+        if validator is not None:
+            try:
+                validator(self._values)
+                return True
+            except fastjsonschema.JsonSchemaException:
+                return False
+
         try:
-            validate(instance=self._values, schema=self.schema)
+            self.validate()
             return True
         except ValidationError:
             return False
@@ -65,50 +153,67 @@ class Thought:
         Raises:
             ValidationError: Se i valori non rispettano lo schema
         """
-        validate(instance=self._values, schema=self.schema)
+        validator = self._get_validator()
+        if validator is None:
+            # Come jsonschema.validate, riporta l'errore più rilevante
+            error = best_match(self._get_jsonschema_validator().iter_errors(self._values))
+            if error is not None:
+                raise error
+            return
+
+        try:
+            validator(self._values)
+        except fastjsonschema.JsonSchemaException as e:
+            raise ValidationError(e.message) from e
+
+
+_INTERVIEW_SCHEMA = MappingProxyType({
+    "type": "object",
+    "required": ["interview_text", "source"],
+    "properties": {
+        "interview_text": {"type": "string"},
+        "source": {"type": "string"}
+    },
+    "additionalProperties": False
+})
 
 
 class InterviewThought(Thought):
     """Thought che rappresenta un'intervista da analizzare"""
 
-    @property
-    def schema(self) -> dict:
-        return {
-            "type": "object",
-            "required": ["interview_text", "source"],
-            "properties": {
-                "interview_text": {"type": "string"},
-                "source": {"type": "string"}
-            },
-            "additionalProperties": False
+    __slots__ = ()
+
+    schema: ClassVar[Mapping[str, Any]] = _INTERVIEW_SCHEMA
+
+
+_TOPICS_SCHEMA = MappingProxyType({
+    "type": "object",
+    "required": ["topics"],
+    "properties": {
+        "topics": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["topic_name", "content", "source"],
+                "properties": {
+                    "topic_name": {"type": "string"},
+                    "content": {"type": "string"},
+                    "source": {"type": "string"}
+                },
+                "additionalProperties": False
+            }
         }
+    },
+    "additionalProperties": False
+})
 
 
 class TopicsThought(Thought):
     """Thought che rappresenta i topics estratti da un'intervista"""
 
-    @property
-    def schema(self) -> dict:
-        return {
-            "type": "object",
-            "required": ["topics"],
-            "properties": {
-                "topics": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "required": ["topic_name", "content", "source"],
-                        "properties": {
-                            "topic_name": {"type": "string"},
-                            "content": {"type": "string"},
-                            "source": {"type": "string"}
-                        },
-                        "additionalProperties": False
-                    }
-                }
-            },
-            "additionalProperties": False
-        }
+    __slots__ = ()
+
+    schema: ClassVar[Mapping[str, Any]] = _TOPICS_SCHEMA
 
 
 # Esempio di utilizzo
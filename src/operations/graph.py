@@ -1,12 +1,47 @@
-from typing import Dict, List, Set, Tuple, Type, Optional
+from typing import Callable, Dict, List, Set, Tuple, Type, Optional, Union
 from dataclasses import dataclass
-from collections import defaultdict
+from functools import cached_property
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import json
+import logging
+import threading
 
 from src.got.node import GoTNode,LLMConfig
 from src.got.thought import Thought
 from src.got.generator import GoTGenerator
 from src.got.keepbest import GoTKeepBest
+from src.got.repeat import GoTRepeat
 from src.got.adapter import GoTAdapter
+from src.got.scheduler import run_levels, token_bin
+
+logger = logging.getLogger(__name__)
+
+
+def _log_thoughts(title: str, thoughts) -> None:
+    """
+    Registra a livello DEBUG tipo e valori dei Thought indicati. I valori vengono
+    formattati solo se il livello DEBUG è abilitato.
+
+    Args:
+        title: Intestazione del messaggio
+        thoughts: Coppie (nome, Thought) da registrare
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    for name, thought in thoughts:
+        logger.debug("%s '%s': tipo %s, valori %s", title, name, type(thought).__name__, thought.values)
+
+
+# Tipi di collegamento, determinati una sola volta in add_edge
+EDGE_STANDARD = "standard"            # Il primo output della sorgente diventa un input nominato
+EDGE_GEN_TO_KEEPER = "gen_to_keeper"  # Gli output di un generator diventano candidati di un keeper
+EDGE_TO_KEEPER = "to_keeper"          # Gli output di un altro nodo diventano candidati di un keeper
+
+# Costruisce gli input di un nodo a partire dagli output di tutti i nodi già eseguiti
+InputBuilder = Callable[[Dict[str, List[Thought]]], Union[Dict[str, Thought], List[Thought]]]
 
 
 @dataclass
@@ -16,6 +51,7 @@ class Edge:
     to_node: str    # ID del nodo destinazione
     from_output: str  # Nome dell'output dal nodo sorgente
     to_input: str     # Nome dell'input al nodo destinazione
+    kind: str = EDGE_STANDARD  # Tipo di collegamento
 
 class GraphOfOperations(GoTNode):
     """
@@ -23,12 +59,30 @@ class GraphOfOperations(GoTNode):
     Ogni nodo nel grafo è un GoTNode e gli archi rappresentano le dipendenze tra i nodi.
     """
 
-    def __init__(self, node_id: str, llm_config: LLMConfig):
+    # Numero massimo di risultati conservati nella cache tra esecuzioni successive
+    RESULT_CACHE_SIZE = 256
+
+    def __init__(self, node_id: str, llm_config: LLMConfig, max_parallel: Optional[int] = None):
+        """
+        Inizializza un grafo vuoto.
+
+        Args:
+            node_id: Identificatore univoco del grafo
+            llm_config: Configurazione del modello LLM
+            max_parallel: Numero massimo di nodi pronti eseguiti in parallelo da process
+                (default: tutti i nodi pronti)
+        """
         super().__init__(node_id, llm_config)
+        if max_parallel is not None and max_parallel <= 0:
+            raise ValueError("max_parallel must be positive")
+        self.max_parallel = max_parallel
 
         # Struttura del grafo
         self.nodes: Dict[str, GoTNode] = {}  # node_id -> node
         self.edges: List[Edge] = []  # Collegamenti tra nodi
+        # Indici degli archi per nodo, aggiornati da add_edge
+        self._incoming: Dict[str, List[Edge]] = defaultdict(list)  # to_node -> archi entranti
+        self._outgoing: Dict[str, List[Edge]] = defaultdict(list)  # from_node -> archi uscenti
 
         # Nodi di input/output del grafo
         self.input_nodes: Set[str] = set()  # IDs dei nodi che ricevono input esterni
@@ -36,6 +90,21 @@ class GraphOfOperations(GoTNode):
 
         # Cache per i risultati intermedi
         self._node_outputs: Dict[str, List[Thought]] = {}
+        # Output dei nodi cacheable tra esecuzioni successive, per (node_id, hash degli input)
+        # (LRU, condivisa dai thread che eseguono i nodi di un livello)
+        self._result_cache: "OrderedDict[Tuple[str, str], List[Thought]]" = OrderedDict()
+        self._result_lock = threading.Lock()
+
+        # Piano di esecuzione: livelli di nodi interni in ordine topologico, calcolati
+        # una sola volta e invalidati da add_node e add_edge
+        self._plan: Optional[List[List[str]]] = None
+        # Funzioni che costruiscono gli input di ogni nodo dagli output dei predecessori,
+        # specializzate sugli archi entranti del nodo
+        self._input_builders: Dict[str, InputBuilder] = {}
+
+        # Nodo opzionale che sostituisce l'intero grafo per input semplici
+        self._fused_node: Optional[GoTNode] = None
+        self._fuse_condition: Optional[Callable[[Dict[str, Thought]], bool]] = None
 
     def add_node(self, node: GoTNode, is_input: bool = False, is_output: bool = False) -> None:
         """
@@ -50,6 +119,11 @@ class GraphOfOperations(GoTNode):
             raise ValueError(f"Node with id {node.node_id} already exists")
 
         self.nodes[node.node_id] = node
+        self._plan = None
+        self._input_builders.clear()
+        # I tipi di input e output del grafo vengono ricalcolati al prossimo accesso
+        self.__dict__.pop("input_thoughts", None)
+        self.__dict__.pop("output_thoughts", None)
 
         if is_input:
             self.input_nodes.add(node.node_id)
@@ -59,79 +133,266 @@ class GraphOfOperations(GoTNode):
     def add_edge(self, from_node: str, to_node: str,
                 from_output: str = "output", to_input: str = "input") -> None:
         """
-        Aggiunge un collegamento tra due nodi.
+        Aggiunge un collegamento tra due nodi. Il tipo del collegamento e la
+        compatibilità tra generator e keeper vengono verificati qui, una sola volta.
 
         Args:
             from_node: ID del nodo sorgente
             to_node: ID del nodo destinazione
             from_output: Nome dell'output dal nodo sorgente
             to_input: Nome dell'input al nodo destinazione
+
+        Raises:
+            ValueError: Se un nodo non esiste o se generator e keeper non sono compatibili
         """
         if from_node not in self.nodes or to_node not in self.nodes:
             raise ValueError("Both nodes must exist in the graph")
 
-        edge = Edge(from_node, to_node, from_output, to_input)
+        source, target = self.nodes[from_node], self.nodes[to_node]
+        if not isinstance(target, GoTKeepBest):
+            kind = EDGE_STANDARD
+        elif isinstance(source, GoTGenerator):
+            GoTAdapter.check_generator_to_keeper(source, target)
+            kind = EDGE_GEN_TO_KEEPER
+        else:
+            kind = EDGE_TO_KEEPER
+
+        edge = Edge(from_node, to_node, from_output, to_input, kind)
         self.edges.append(edge)
+        self._incoming[to_node].append(edge)
+        self._outgoing[from_node].append(edge)
+        self._plan = None
+        self._input_builders.clear()
 
-    def _get_node_dependencies(self) -> Dict[str, Set[str]]:
+    def set_fused_node(self, node: GoTNode, condition: Callable[[Dict[str, Thought]], bool]) -> None:
         """
-        Calcola le dipendenze tra i nodi.
+        Registra un nodo che esegue da solo l'intero lavoro del grafo quando
+        la condizione sugli input esterni è soddisfatta (ad esempio per input piccoli,
+        per i quali una singola chiamata all'LLM evita tutte le chiamate intermedie).
 
-        Returns:
-            Dizionario node_id -> set di node_id da cui dipende
+        Args:
+            node: Nodo che accetta gli stessi input del grafo e produce lo stesso tipo di output
+            condition: Funzione che, dati gli input esterni, indica se usare il nodo fuso
         """
-        dependencies = defaultdict(set)
-        for edge in self.edges:
-            dependencies[edge.to_node].add(edge.from_node)
-        return dependencies
+        self._fused_node = node
+        self._fuse_condition = condition
 
-    def _get_ready_nodes(self, dependencies: Dict[str, Set[str]],
-                        completed_nodes: Set[str]) -> List[str]:
+    def _prepare_node_inputs(self, node_id: str) -> Union[Dict[str, Thought], List[Thought]]:
         """
-        Trova i nodi pronti per essere eseguiti.
-        Un nodo è pronto quando tutti i suoi predecessori sono stati completati.
+        Prepara gli input per un nodo dai risultati dei suoi predecessori.
+
+        Args:
+            node_id: ID del nodo per cui preparare gli input
 
         Returns:
-            Lista di node_id pronti per l'esecuzione
+            Dizionario degli input per il nodo, oppure la lista dei candidati
+            se il nodo è un GoTKeepBest
         """
-        ready_nodes = []
-        for node_id in self.nodes:
-            if node_id not in completed_nodes:
-                node_deps = dependencies.get(node_id, set())
-                if all(dep in completed_nodes for dep in node_deps):
-                    ready_nodes.append(node_id)
-        return ready_nodes
-
-    def _prepare_node_inputs(self, node_id: str) -> Dict[str, Thought]:
+        builder = self._input_builders.get(node_id)
+        if builder is None:
+            builder = self._input_builders[node_id] = self._compile_input_builder(node_id)
+        return builder(self._node_outputs)
+
+    def _compile_input_builder(self, node_id: str) -> InputBuilder:
         """
-        Prepara gli input per un nodo dai risultati dei suoi predecessori.
+        Crea la funzione che costruisce gli input di un nodo, fissando una volta per
+        tutte gli archi entranti da cui leggere, così che ad ogni esecuzione non
+        vengano riesaminati tipi e attributi degli archi.
 
         Args:
-            node_id: ID del nodo per cui preparare gli input
+            node_id: ID del nodo destinazione
 
         Returns:
-            Dizionario degli input per il nodo
+            Funzione che riceve gli output dei nodi eseguiti e restituisce il dizionario
+            degli input, oppure la lista dei candidati se il nodo è un GoTKeepBest
         """
-        inputs = {}
-        input_edges = [e for e in self.edges if e.to_node == node_id]
-
-        for edge in input_edges:
-            from_node = self.nodes[edge.from_node]
-            target_node = self.nodes[node_id]
-            if isinstance(from_node, GoTGenerator) and isinstance(target_node, GoTKeepBest):
-                # Usa l'adapter per collegamenti Generator -> Keeper
-                GoTAdapter.connect_generator_to_keeper(
-                    generator=from_node,
-                    keeper=target_node
-                )
-                # Gli input verranno gestiti internamente dall'adapter
-                return {}
-            else:
-                # Gestione standard degli input
-                predecessor_outputs = self._node_outputs[edge.from_node]
-                inputs[edge.to_input] = predecessor_outputs[0]  # Prende il primo output
+        incoming = self._incoming.get(node_id, ())
+
+        if all(edge.kind == EDGE_STANDARD for edge in incoming):
+            # Gestione standard degli input: prende il primo output di ogni sorgente
+            keys = tuple((edge.from_node, edge.to_input) for edge in incoming)
+            return lambda outputs: {to_input: outputs[from_node][0] for from_node, to_input in keys}
+
+        # Un keeper riceve tutti gli output di tutti i predecessori; un generator
+        # senza output non fornisce candidati validi
+        sources = tuple(
+            (edge.from_node, edge.kind == EDGE_GEN_TO_KEEPER)
+            for edge in incoming if edge.kind != EDGE_STANDARD
+        )
+
+        def build_candidates(outputs: Dict[str, List[Thought]]) -> List[Thought]:
+            candidates: List[Thought] = []
+            for from_node, required in sources:
+                node_outputs = outputs[from_node]
+                if required and not node_outputs:
+                    raise ValueError("Generator has no outputs to process")
+                candidates.extend(node_outputs)
+            return candidates
+
+        return build_candidates
+
+    def _get_plan(self) -> List[List[str]]:
+        """
+        Restituisce il piano di esecuzione, compilandolo al primo utilizzo dopo
+        una modifica della topologia.
+
+        Raises:
+            ValueError: Se il grafo contiene una dipendenza circolare
+        """
+        if self._plan is None:
+            self._plan = self._compile_plan()
+        return self._plan
+
+    def _compile_plan(self) -> List[List[str]]:
+        """
+        Divide i nodi interni in livelli con l'algoritmo di Kahn: ogni livello contiene
+        i nodi i cui predecessori appartengono ai nodi di input o ai livelli precedenti.
+
+        Returns:
+            Livelli in ordine topologico
+
+        Raises:
+            ValueError: Se il grafo contiene una dipendenza circolare
+        """
+        # Grado di ingresso dei nodi interni, contando solo i predecessori interni
+        in_degree: Dict[str, int] = {
+            node_id: sum(1 for edge in self._incoming.get(node_id, ())
+                         if edge.from_node not in self.input_nodes)
+            for node_id in self.nodes if node_id not in self.input_nodes
+        }
+
+        levels: List[List[str]] = []
+        ready = [node_id for node_id, degree in in_degree.items() if degree == 0]
+        while ready:
+            levels.append(ready)
+            next_ready = []
+            for node_id in ready:
+                # I successori senza altri predecessori in attesa diventano pronti
+                for edge in self._outgoing.get(node_id, ()):
+                    if edge.to_node not in in_degree:
+                        continue
+                    in_degree[edge.to_node] -= 1
+                    if in_degree[edge.to_node] == 0:
+                        next_ready.append(edge.to_node)
+            ready = next_ready
+
+        if sum(len(level) for level in levels) < len(in_degree):
+            raise ValueError("Rilevata dipendenza circolare nel grafo")
+        return levels
+
+    def clear_cache(self) -> None:
+        """Svuota la cache degli output dei nodi tra esecuzioni successive"""
+        with self._result_lock:
+            self._result_cache.clear()
+
+    def _result_key(self, node_id: str,
+                    node_inputs: Union[Dict[str, Thought], List[Thought]]) -> Optional[Tuple[str, str]]:
+        """
+        Calcola la chiave della cache dei risultati per un nodo e i suoi input.
+
+        Returns:
+            Coppia (node_id, hash degli input), oppure None se il nodo non è cacheable
+            o se la sua configurazione non è deterministica (temperature > 0) e
+            cache_nondeterministic è False
+        """
+        node = self.nodes[node_id]
+        if not node.cacheable:
+            return None
+        config = node.llm_config
+        if config is not None and config.temperature != 0 and not node.cache_nondeterministic:
+            return None
+
+        if isinstance(node_inputs, dict):
+            payload = {name: [type(t).__name__, t.values] for name, t in node_inputs.items()}
+        else:
+            payload = [[type(t).__name__, t.values] for t in node_inputs]
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return node_id, hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+    def _load_result(self, node_id: str, key: Optional[Tuple[str, str]]) -> bool:
+        """Assegna al nodo una copia degli output salvati per la chiave, se presenti"""
+        if key is None:
+            return False
+        with self._result_lock:
+            cached = self._result_cache.get(key)
+            if cached is None:
+                return False
+            self._result_cache.move_to_end(key)
+        logger.debug("Output di %s recuperati dalla cache", node_id)
+        self.nodes[node_id].outputs = list(cached)
+        return True
+
+    def _save_result(self, node_id: str, key: Optional[Tuple[str, str]]) -> None:
+        """Salva una copia degli output del nodo per la chiave, se il nodo non è fallito"""
+        node = self.nodes[node_id]
+        if key is None or node.has_error:
+            return
+        with self._result_lock:
+            self._result_cache[key] = list(node.outputs)
+            self._result_cache.move_to_end(key)
+            if len(self._result_cache) > self.RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+
+    def _run_node(self, node_id: str,
+                  node_inputs: Optional[Union[Dict[str, Thought], List[Thought]]] = None) -> None:
+        """
+        Esegue un nodo pronto, se non è già stato processato (ad esempio in batch
+        con altri nodi) e se i suoi output non sono già in cache per gli stessi
+        input. Gli errori restano registrati nel nodo.
+
+        Args:
+            node_id: ID del nodo da eseguire
+            node_inputs: Input del nodo (default: gli output dei suoi predecessori)
+        """
+        logger.debug("Processando nodo: %s", node_id)
+        node = self.nodes[node_id]
+        if node_inputs is None:
+            node_inputs = self._prepare_node_inputs(node_id)
+
+        prepared = node_inputs.items() if isinstance(node_inputs, dict) else enumerate(node_inputs)
+        _log_thoughts(f"Input di {node_id}", prepared)
 
-        return inputs
+        if not node.outputs and not node.has_error:
+            key = self._result_key(node_id, node_inputs)
+            if not self._load_result(node_id, key):
+                node.process(node_inputs)
+                self._save_result(node_id, key)
+
+    def _process_repeat_groups(self, ready_nodes: List[str]) -> None:
+        """
+        Raggruppa i GoTRepeat pronti che ripetono lo stesso tipo di generator
+        e li processa con un'unica richiesta batch all'LLM.
+
+        Args:
+            ready_nodes: Lista di node_id pronti per l'esecuzione
+        """
+        groups: List[List[Tuple[GoTRepeat, Dict[str, Thought], Optional[Tuple[str, str]]]]] = []
+        for node_id in ready_nodes:
+            node = self.nodes[node_id]
+            if not isinstance(node, GoTRepeat) or not node.batch or node.outputs:
+                continue
+
+            node_inputs = self._prepare_node_inputs(node_id)
+            key = self._result_key(node_id, node_inputs)
+            if self._load_result(node_id, key):
+                continue
+
+            for group in groups:
+                if group[0][0].can_batch_with(node):
+                    group.append((node, node_inputs, key))
+                    break
+            else:
+                groups.append([(node, node_inputs, key)])
+
+        for group in groups:
+            if len(group) > 1:
+                logger.debug("Processando in batch i nodi: %s", [node.node_id for node, _, _ in group])
+                GoTRepeat.process_group(
+                    [node for node, _, _ in group],
+                    [node_inputs for _, node_inputs, _ in group]
+                )
+                for node, _, key in group:
+                    self._save_result(node.node_id, key)
 
     def process(self, inputs: Dict[str, Thought]) -> None:
         """
@@ -141,99 +402,165 @@ class GraphOfOperations(GoTNode):
             inputs: Dizionario degli input esterni per i nodi di input
         """
         try:
-            print(f"\n{'='*50}")
-            print(f"Iniziando l'esecuzione del grafo: {self.node_id}")
-            print(f"{'='*50}")
-
-            print("\nInput ricevuti:")
-            for input_id, thought in inputs.items():
-                print(f"\nThought '{input_id}':")
-                print(f"  Tipo: {type(thought).__name__}")
-                print(f"  Valori: {thought.values}")
+            logger.debug("Iniziando l'esecuzione del grafo: %s", self.node_id)
+            _log_thoughts("Input ricevuto", inputs.items())
 
-            # Resetta la cache dei risultati
+            # Resetta i risultati dell'esecuzione precedente
             self._node_outputs.clear()
+            for node in self.nodes.values():
+                node.reset()
+
+            # Per input semplici il nodo fuso sostituisce l'intero grafo
+            if self._fused_node is not None and self._fuse_condition(inputs):
+                logger.debug("Esecuzione fusa tramite il nodo: %s", self._fused_node.node_id)
+                self._fused_node.process(inputs)
+                if self._fused_node.has_error:
+                    raise ValueError(
+                        f"Fallimento del nodo {self._fused_node.node_id}: {self._fused_node.error_message}"
+                    )
+                self.outputs = self._fused_node.outputs
+                return
 
             # Distribuisce gli input esterni ai nodi di input
-            print("\nElaborazione nodi di input:")
-            print("-" * 30)
             for node_id in self.input_nodes:
-                print(f"\nProcessando nodo di input: {node_id}")
-                self.nodes[node_id].process(inputs)
+                self._run_node(node_id, inputs)
                 self._node_outputs[node_id] = self.nodes[node_id].outputs
-                print(f"Output generati da {node_id}:")
-                for i, thought in enumerate(self._node_outputs[node_id]):
-                    print(f"  Output {i+1}:")
-                    print(f"    Tipo: {type(thought).__name__}")
-                    print(f"    Valori: {thought.values}")
-
-            # Calcola le dipendenze tra i nodi
-            dependencies = self._get_node_dependencies()
-            completed_nodes = set(self.input_nodes)
-
-            # Esegue i nodi in ordine topologico
-            print("\nElaborazione nodi interni:")
-            print("-" * 30)
-            while len(completed_nodes) < len(self.nodes):
-                ready_nodes = self._get_ready_nodes(dependencies, completed_nodes)
-
-                if not ready_nodes:
-                    raise ValueError("Rilevata dipendenza circolare nel grafo")
+                _log_thoughts(f"Output di {node_id}", enumerate(self._node_outputs[node_id], 1))
+
+            # Esegue i livelli del piano in ordine topologico
+            for ready_nodes in self._get_plan():
+                self._process_repeat_groups(ready_nodes)
+
+                # I nodi pronti non dipendono l'uno dall'altro: le loro chiamate
+                # all'LLM vengono eseguite in parallelo
+                if len(ready_nodes) == 1 or self.max_parallel == 1:
+                    for node_id in ready_nodes:
+                        self._run_node(node_id)
+                else:
+                    workers = min(len(ready_nodes), self.max_parallel or len(ready_nodes))
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        list(executor.map(self._run_node, ready_nodes))
 
                 for node_id in ready_nodes:
-                    print(f"\nProcessando nodo: {node_id}")
                     node = self.nodes[node_id]
-                    node_inputs = self._prepare_node_inputs(node_id)
-
-                    print("Input preparati:")
-                    for input_id, thought in node_inputs.items():
-                        print(f"  Input '{input_id}':")
-                        print(f"    Tipo: {type(thought).__name__}")
-                        print(f"    Valori: {thought.values}")
-
-                    if not node.outputs:
-                        node.process(node_inputs)
-
                     if node.has_error:
-                        print(f"ERRORE nel nodo {node_id}: {node.error_message}")
                         raise ValueError(f"Fallimento del nodo {node_id}: {node.error_message}")
 
                     self._node_outputs[node_id] = node.outputs
-                    print(f"\nOutput generati da {node_id}:")
-                    for i, thought in enumerate(self._node_outputs[node_id]):
-                        print(f"  Output {i+1}:")
-                        print(f"    Tipo: {type(thought).__name__}")
-                        print(f"    Valori: {thought.values}")
-
-                    completed_nodes.add(node_id)
-                    print(f"Completato nodo {node_id}")
+                    _log_thoughts(f"Output di {node_id}", enumerate(self._node_outputs[node_id], 1))
+                    logger.debug("Completato nodo %s", node_id)
 
             # Raccoglie gli output finali
-            print("\nRaccolta output finali:")
-            print("-" * 30)
             final_outputs = []
             for output_node_id in self.output_nodes:
-                print(f"\nRaccogliendo output da: {output_node_id}")
                 final_outputs.extend(self._node_outputs[output_node_id])
             self.outputs = final_outputs
 
-            print("\nOutput finali del grafo:")
-            for i, thought in enumerate(self.outputs):
-                print(f"  Output {i+1}:")
-                print(f"    Tipo: {type(thought).__name__}")
-                print(f"    Valori: {thought.values}")
+            _log_thoughts("Output finale del grafo", enumerate(self.outputs, 1))
+            logger.debug("Esecuzione del grafo %s completata con successo", self.node_id)
+
+        except Exception as e:
+            error_msg = f"Errore nel grafo {self.node_id}: {str(e)}"
+            logger.error(error_msg)
+            self.set_error(error_msg)
+            raise
+
+    async def aprocess(self, inputs: Dict[str, Thought]) -> None:
+        """
+        Esegue il grafo di operazioni in modo asincrono: i nodi indipendenti
+        dello stesso livello del piano vengono eseguiti in concorrenza tramite run_levels.
 
-            print(f"\n{'='*50}")
-            print("Esecuzione del grafo completata con successo")
-            print(f"{'='*50}\n")
+        Args:
+            inputs: Dizionario degli input esterni per i nodi di input
+        """
+        try:
+            logger.debug("Iniziando l'esecuzione asincrona del grafo: %s", self.node_id)
+
+            # Resetta i risultati dell'esecuzione precedente
+            self._node_outputs.clear()
+            for node in self.nodes.values():
+                node.reset()
+
+            # Per input semplici il nodo fuso sostituisce l'intero grafo
+            if self._fused_node is not None and self._fuse_condition(inputs):
+                logger.debug("Esecuzione fusa tramite il nodo: %s", self._fused_node.node_id)
+                await self._fused_node.aprocess(inputs)
+                if self._fused_node.has_error:
+                    raise ValueError(
+                        f"Fallimento del nodo {self._fused_node.node_id}: {self._fused_node.error_message}"
+                    )
+                self.outputs = self._fused_node.outputs
+                return
+
+            def complete_node(node_id: str) -> None:
+                node = self.nodes[node_id]
+                if node.has_error:
+                    raise ValueError(f"Fallimento del nodo {node_id}: {node.error_message}")
+
+                self._node_outputs[node_id] = node.outputs
+                logger.debug("Completato nodo %s", node_id)
+
+            async def run_node(node_id: str, node_inputs: Dict[str, Thought]) -> None:
+                node = self.nodes[node_id]
+                if not node.outputs and not node.has_error:
+                    key = self._result_key(node_id, node_inputs)
+                    if not self._load_result(node_id, key):
+                        await node.aprocess(node_inputs)
+                        self._save_result(node_id, key)
+                complete_node(node_id)
+
+            # I nodi di input ricevono gli input esterni
+            await asyncio.gather(*(run_node(node_id, inputs) for node_id in self.input_nodes))
+
+            def group_key(node_id: str) -> Optional[Tuple]:
+                # I generator pronti con la stessa configurazione e una lunghezza attesa
+                # dell'output simile vengono inviati all'LLM in un unico batch, così che
+                # il batch non resti in attesa di una risposta molto più lunga delle altre
+                node = self.nodes[node_id]
+                if (not isinstance(node, GoTGenerator) or node.outputs or node.has_error
+                        or node.response_cache is not None):
+                    return None
+                node_inputs = self._prepare_node_inputs(node_id)
+                # Un nodo con gli output in cache viene completato da run_node senza LLM
+                if self._load_result(node_id, self._result_key(node_id, node_inputs)):
+                    return None
+                expected_tokens = node.expected_output_tokens(node_inputs)
+                return node.llm_config, token_bin(expected_tokens)
+
+            async def run_group(node_ids: List[str]) -> None:
+                logger.debug("Processando in batch i nodi: %s", node_ids)
+                inputs_list = [self._prepare_node_inputs(node_id) for node_id in node_ids]
+                await asyncio.to_thread(
+                    GoTGenerator.process_group,
+                    [self.nodes[node_id] for node_id in node_ids],
+                    inputs_list
+                )
+                for node_id, node_inputs in zip(node_ids, inputs_list):
+                    self._save_result(node_id, self._result_key(node_id, node_inputs))
+                    complete_node(node_id)
+
+            # Gli altri nodi ricevono gli output dei predecessori
+            await run_levels(
+                self._get_plan(),
+                lambda node_id: run_node(node_id, self._prepare_node_inputs(node_id)),
+                group_by=group_key,
+                run_group=run_group
+            )
+
+            final_outputs = []
+            for output_node_id in self.output_nodes:
+                final_outputs.extend(self._node_outputs[output_node_id])
+            self.outputs = final_outputs
+
+            logger.debug("Esecuzione del grafo %s completata con successo", self.node_id)
 
         except Exception as e:
             error_msg = f"Errore nel grafo {self.node_id}: {str(e)}"
-            print(f"\nERRORE: {error_msg}")
+            logger.error(error_msg)
             self.set_error(error_msg)
             raise
 
-    @property
+    @cached_property
     def input_thoughts(self) -> Dict[str, Type[Thought]]:
         """Tipi di Thought accettati come input dai nodi di input."""
         input_types = []
@@ -241,7 +568,7 @@ class GraphOfOperations(GoTNode):
             input_types.extend(self.nodes[node_id].input_thoughts)
         return input_types
 
-    @property
+    @cached_property
     def output_thoughts(self) -> Type[Thought]:
         """Tipo di Thought prodotto come output dai nodi di output."""
         if not self.output_nodes:
@@ -251,6 +578,11 @@ class GraphOfOperations(GoTNode):
 
     @property
     def output_cardinality(self) -> int:
-        """Cardinalità totale degli output prodotti dai nodi di output."""
-        return sum(self.nodes[node_id].output_cardinality
-                  for node_id in self.output_nodes)
+        """
+        Cardinalità totale degli output prodotti dai nodi di output,
+        oppure -1 se almeno uno di essi ha cardinalità variabile.
+        """
+        cardinalities = [self.nodes[node_id].output_cardinality for node_id in self.output_nodes]
+        if any(cardinality < 0 for cardinality in cardinalities):
+            return -1
+        return sum(cardinalities)
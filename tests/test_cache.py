@@ -0,0 +1,67 @@
+import unittest
+
+from src.got.cache import MemoryCache
+from src.got.node import LLMConfig
+from examples.sorting.sort_int_set import IntSetThought, Sorter
+from tests.test_graph import CountingLLM
+
+
+class MemoryCacheTest(unittest.TestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "3")
+
+    def test_max_entries_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            MemoryCache(max_entries=0)
+
+
+class ResponseCacheTest(unittest.TestCase):
+    """Uso della cache delle risposte da parte di GoTGenerator"""
+
+    def _run_twice(self, temperature: float, cache_nondeterministic: bool = False) -> int:
+        llm = CountingLLM()
+        sorter = Sorter("sort", LLMConfig("test", temperature=temperature))
+        sorter.llm = llm
+        sorter.response_cache = MemoryCache()
+        sorter.cache_nondeterministic = cache_nondeterministic
+
+        for _ in range(2):
+            sorter.process({"input": IntSetThought.create("input", [3, 1, 2])})
+            self.assertEqual(sorter.outputs[0].get_values(), [1, 2, 3])
+        return llm.calls
+
+    def test_hit_at_zero_temperature(self):
+        self.assertEqual(self._run_twice(temperature=0), 1)
+
+    def test_bypass_at_positive_temperature(self):
+        self.assertEqual(self._run_twice(temperature=0.1), 2)
+
+    def test_nondeterministic_opt_in(self):
+        self.assertEqual(self._run_twice(temperature=0.1, cache_nondeterministic=True), 1)
+
+    def test_cache_key(self):
+        sorter = Sorter("sort", LLMConfig("test", temperature=0))
+        prompt = sorter._build_prompt({"input": IntSetThought.create("input", [3, 1, 2])})
+        other = sorter._build_prompt({"input": IntSetThought.create("input", [2, 3, 1])})
+
+        self.assertIsNone(sorter._cache_key(prompt))
+
+        sorter.response_cache = MemoryCache()
+        self.assertEqual(sorter._cache_key(prompt), sorter._cache_key(prompt))
+        self.assertNotEqual(sorter._cache_key(prompt), sorter._cache_key(other))
+
+        sorter.llm_config = LLMConfig("test", temperature=0.1)
+        self.assertIsNone(sorter._cache_key(prompt))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import unittest
+
+import numpy as np
+from langchain_core.language_models.fake import FakeListLLM
+
+from src.got.node import LLMConfig
+from examples.decontextualization.decontextualizer import (
+    DecontextualizedThought, Decontextualizer, SentenceThought
+)
+from examples.decontextualization.semantic_cache import SemanticCache
+
+
+class DecontextualizedThoughtTest(unittest.TestCase):
+
+    def setUp(self):
+        self.thought = DecontextualizedThought("output")
+        self.thought.values = {
+            "in_context_sentence": "I must to re-write all before leaving",
+            "standalone_sentence": "Maria must re-write her notes before leaving her shift"
+        }
+
+    def test_get_for_template_in_context_sentence(self):
+        self.assertEqual(self.thought.get_for_template("in_context_sentence"),
+                         "I must to re-write all before leaving")
+
+    def test_get_for_template_standalone_sentence(self):
+        self.assertEqual(self.thought.get_for_template("standalone_sentence"),
+                         "Maria must re-write her notes before leaving her shift")
+
+
+class UnavailableEmbeddingCache(SemanticCache):
+    """SemanticCache il cui modello di embedding non è disponibile"""
+
+    def _embed(self, text: str) -> np.ndarray:
+        raise ConnectionError("embedding model not found")
+
+
+class DecontextualizerCacheTest(unittest.TestCase):
+
+    RESPONSE = {"in_context_sentence": "I am a caregiver.",
+                "standalone_sentence": "Maria is a caregiver."}
+
+    def setUp(self):
+        self.cache = UnavailableEmbeddingCache(":memory:")
+        self.decontextualizer = Decontextualizer("decontext", LLMConfig("test", temperature=0),
+                                                 cache=self.cache)
+        self.decontextualizer.llm = FakeListLLM(responses=[json.dumps(self.RESPONSE)])
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_embedding_error_falls_back_to_llm(self):
+        sentence = SentenceThought("input")
+        sentence.values = {"sentence": "I am a caregiver.", "context": "My name is Maria."}
+
+        with self.assertLogs("examples.decontextualization.decontextualizer", level="WARNING"):
+            self.decontextualizer.process({"input": sentence})
+
+        self.assertFalse(self.decontextualizer.has_error)
+        self.assertEqual(self.decontextualizer.outputs[0].values, self.RESPONSE)
+
+    def test_invalid_inputs_set_error(self):
+        with self.assertRaises(ValueError):
+            self.decontextualizer.process({"other": SentenceThought("input")})
+
+        self.assertTrue(self.decontextualizer.has_error)
+
+
+if __name__ == "__main__":
+    unittest.main()
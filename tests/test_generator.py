@@ -0,0 +1,112 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from langchain_core.language_models.fake import FakeListLLM, FakeStreamingListLLM
+
+from src.got.generator import _StreamingItemsParser
+from src.got.node import LLMConfig
+from examples.sorting.sort_int_set import IntSetThought, Sorter, Splitter
+
+
+_SPLIT_RESPONSE = json.dumps({"items": [
+    {"values": [1, 2], "size": 2},
+    {"values": [3, 4], "size": 2},
+]})
+
+
+class AinvokeUntilJsonTest(unittest.TestCase):
+    """Interruzione anticipata dello streaming in _ainvoke_until_json"""
+
+    def _make_splitter(self, response: str) -> Splitter:
+        splitter = Splitter("split", LLMConfig("test", temperature=0))
+        # FakeStreamingListLLM restituisce la risposta un carattere alla volta
+        splitter.llm = FakeStreamingListLLM(responses=[response])
+        return splitter
+
+    def test_nested_object_does_not_stop_stream(self):
+        splitter = self._make_splitter(_SPLIT_RESPONSE + " trailing text")
+
+        output = asyncio.run(splitter._ainvoke_until_json("prompt"))
+
+        self.assertEqual(output, _SPLIT_RESPONSE)
+
+    def test_aprocess_with_nested_chunked_response(self):
+        splitter = self._make_splitter(_SPLIT_RESPONSE)
+
+        asyncio.run(splitter.aprocess({"input": IntSetThought.create("in", [3, 1, 4, 2])}))
+
+        self.assertFalse(splitter.has_error)
+        self.assertEqual([t.get_values() for t in splitter.outputs], [[1, 2], [3, 4]])
+
+
+class StreamingItemsParserTest(unittest.TestCase):
+    """Estrazione incrementale degli elementi di 'items' da una risposta in streaming"""
+
+    def _feed_all(self, parser: _StreamingItemsParser, chunks):
+        return [parser.feed(chunk) for chunk in chunks]
+
+    def test_items_are_returned_as_they_complete(self):
+        parser = _StreamingItemsParser()
+
+        results = self._feed_all(parser, [
+            'Sure! {"items": [{"values": [1, ',
+            '2], "size": 2}, {"val',
+            'ues": [3], "size": 1}',
+            ']}',
+        ])
+
+        self.assertEqual(results, [
+            [],
+            [{"values": [1, 2], "size": 2}],
+            [],
+            [{"values": [3], "size": 1}],
+        ])
+
+    def test_character_chunks(self):
+        parser = _StreamingItemsParser()
+
+        items = [item for chunk in _SPLIT_RESPONSE for item in parser.feed(chunk)]
+
+        self.assertEqual(items, json.loads(_SPLIT_RESPONSE)["items"])
+
+    def test_nothing_after_array_end(self):
+        parser = _StreamingItemsParser()
+
+        results = self._feed_all(parser, ['{"items": []}', ' {"items": [{"size": 1}]}'])
+
+        self.assertEqual(results, [[], []])
+
+
+class RetryBackoffTest(unittest.TestCase):
+    """Attesa crescente tra i tentativi di generazione"""
+
+    def _make_sorter(self, responses) -> Sorter:
+        sorter = Sorter("sort", LLMConfig("test", temperature=0))
+        sorter.llm = FakeListLLM(responses=responses)
+        sorter.REPAIR_ATTEMPTS = 0
+        sorter.RETRY_BACKOFF = 0.5
+        return sorter
+
+    def test_delays_double_between_attempts(self):
+        sorter = self._make_sorter(["not json", "still not json", '{"values": [1, 2, 3], "size": 3}'])
+
+        with mock.patch("src.got.generator.time.sleep") as sleep:
+            sorter.process({"input": IntSetThought.create("input", [3, 1, 2])})
+
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+        self.assertEqual(sorter.outputs[0].get_values(), [1, 2, 3])
+
+    def test_no_delay_without_backoff(self):
+        sorter = self._make_sorter(["not json", '{"values": [1, 2, 3], "size": 3}'])
+        sorter.RETRY_BACKOFF = 0.0
+
+        with mock.patch("src.got.generator.time.sleep") as sleep:
+            sorter.process({"input": IntSetThought.create("input", [3, 1, 2])})
+
+        sleep.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from typing import Any, List, Optional
+
+from langchain_core.language_models.llms import LLM
+
+from src.got.node import LLMConfig
+from src.got.repeat import GoTRepeat
+from src.operations.graph import GraphOfOperations
+from examples.sorting.sort_int_set import IntSetThought, Sorter
+
+
+class CountingLLM(LLM):
+    """LLM fittizio che restituisce sempre lo stesso insieme ordinato e conta le chiamate"""
+
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "counting"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None,
+              run_manager: Any = None, **kwargs: Any) -> str:
+        self.calls += 1
+        return '{"values": [1, 2, 3], "size": 3}'
+
+
+class ResultCacheTest(unittest.TestCase):
+    """Riuso degli output dei nodi tra esecuzioni successive del grafo"""
+
+    def _make_graph(self, node, llm: CountingLLM) -> GraphOfOperations:
+        generator = node.embedded_generator if isinstance(node, GoTRepeat) else node
+        generator.llm = llm
+        graph = GraphOfOperations("graph", node.llm_config)
+        graph.add_node(node, is_input=True, is_output=True)
+        return graph
+
+    @staticmethod
+    def _inputs(values: List[int]):
+        return {"input": IntSetThought.create("input", values)}
+
+    def test_deterministic_node_is_reused(self):
+        llm = CountingLLM()
+        graph = self._make_graph(Sorter("sort", LLMConfig("test", temperature=0)), llm)
+
+        graph.process(self._inputs([3, 1, 2]))
+        graph.process(self._inputs([3, 1, 2]))
+
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(graph.outputs[0].get_values(), [1, 2, 3])
+
+    def test_nondeterministic_node_is_not_reused(self):
+        llm = CountingLLM()
+        graph = self._make_graph(Sorter("sort", LLMConfig("test", temperature=0.1)), llm)
+
+        graph.process(self._inputs([3, 1, 2]))
+        graph.process(self._inputs([3, 1, 2]))
+
+        self.assertEqual(llm.calls, 2)
+
+    def test_repeat_is_not_reused(self):
+        llm = CountingLLM()
+        config = LLMConfig("test", temperature=0)
+        graph = self._make_graph(GoTRepeat("repeat", config, Sorter("sort", config), k=2), llm)
+
+        graph.process(self._inputs([3, 1, 2]))
+        first_run_calls = llm.calls
+        graph.process(self._inputs([3, 1, 2]))
+
+        self.assertGreater(llm.calls, first_run_calls)
+
+    def test_cached_outputs_are_copies(self):
+        llm = CountingLLM()
+        graph = self._make_graph(Sorter("sort", LLMConfig("test", temperature=0)), llm)
+
+        graph.process(self._inputs([3, 1, 2]))
+        graph.nodes["sort"].outputs.clear()
+        graph.process(self._inputs([3, 1, 2]))
+
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(len(graph.nodes["sort"].outputs), 1)
+
+    def test_cache_is_bounded(self):
+        llm = CountingLLM()
+        graph = self._make_graph(Sorter("sort", LLMConfig("test", temperature=0)), llm)
+        graph.RESULT_CACHE_SIZE = 2
+
+        for values in ([3, 1, 2], [2, 3, 1], [1, 3, 2]):
+            graph.process(self._inputs(values))
+        graph.process(self._inputs([3, 1, 2]))
+
+        # Il risultato meno recente è stato scartato e viene ricalcolato
+        self.assertEqual(llm.calls, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from typing import Dict, List, Type
+
+from src.got.keepbest import GoTKeepBest
+from src.got.thought import Thought
+from examples.sorting.sort_int_set import IntSetThought, SortingKeepBest
+
+
+class SortingKeepBestTest(unittest.TestCase):
+
+    def test_best_ordering_is_selected(self):
+        keeper = SortingKeepBest("keep", None)
+        candidates = [
+            IntSetThought.create("a", [3, 1, 2]),
+            IntSetThought.create("b", [1, 2, 3]),
+            IntSetThought.create("c", [2, 1, 3]),
+        ]
+
+        keeper.process(candidates)
+
+        self.assertFalse(keeper.has_error)
+        self.assertEqual(keeper.outputs[0].thought_id, "b")
+
+    def test_differences_below_tolerance_are_ties(self):
+        keeper = SortingKeepBest("keep", None)
+        # Score che differiscono meno di 0.001: vince il primo candidato
+        keeper._scores = [{"ordering_score": 0.5}, {"ordering_score": 0.5005}]
+
+        self.assertEqual(keeper._best_index(), 0)
+
+
+class LexicographicKeepBest(GoTKeepBest):
+    """Keeper che confronta gli score per chiave, in ordine di priorità"""
+
+    score_keys = ("primary", "secondary")
+
+    @property
+    def input_thoughts(self) -> List[Type[Thought]]:
+        return [IntSetThought]
+
+    def _assign_scores(self, input: Thought) -> Dict[str, float]:
+        values = input.get_values()
+        return {"primary": values[0], "secondary": values[1]}
+
+    def _compare(self, scores1: Dict[str, float], scores2: Dict[str, float]) -> int:
+        raise AssertionError("_compare non deve essere usato con score_keys")
+
+
+class ScoreKeysTest(unittest.TestCase):
+
+    def test_later_keys_break_ties(self):
+        keeper = LexicographicKeepBest("keep", None)
+
+        keeper.process([
+            IntSetThought.create("a", [1, 5]),
+            IntSetThought.create("b", [2, 1]),
+            IntSetThought.create("c", [2, 3]),
+            IntSetThought.create("d", [2, 3]),
+        ])
+
+        self.assertFalse(keeper.has_error)
+        self.assertEqual(keeper.outputs[0].thought_id, "c")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from src.got.node import LLMConfig
+from src.got.repeat import GoTRepeat
+from examples.sorting.sort_int_set import IntSetThought, Sorter
+from tests.test_graph import CountingLLM
+
+
+def _is_sorted(thought: IntSetThought) -> bool:
+    values = thought.get_values()
+    return all(a <= b for a, b in zip(values, values[1:]))
+
+
+class EarlyStopTest(unittest.TestCase):
+    """Ripetizioni saltate quando il primo campione soddisfa la condizione di arresto"""
+
+    def _make_repeat(self, llm: CountingLLM, batch: bool) -> GoTRepeat:
+        config = LLMConfig("test", temperature=0)
+        sorter = Sorter("sort", config)
+        sorter.llm = llm
+        return GoTRepeat("repeat", config, sorter, k=3, batch=batch, should_stop=_is_sorted)
+
+    def test_perfect_first_sample_skips_remaining_calls(self):
+        for batch in (True, False):
+            with self.subTest(batch=batch):
+                llm = CountingLLM()
+                repeat = self._make_repeat(llm, batch)
+
+                repeat.process({"input": IntSetThought.create("input", [3, 1, 2])})
+
+                self.assertFalse(repeat.has_error)
+                self.assertEqual(llm.calls, 1)
+                self.assertEqual(len(repeat.outputs), 1)
+
+    def test_cardinality_is_variable_with_stop_condition(self):
+        repeat = self._make_repeat(CountingLLM(), batch=True)
+
+        self.assertEqual(repeat.output_cardinality, -1)
+
+
+class CanBatchWithTest(unittest.TestCase):
+
+    def test_embedded_generator_config_is_compared(self):
+        config = LLMConfig("test", temperature=0)
+        first = GoTRepeat("r1", config, Sorter("s1", LLMConfig("model-a", temperature=0)), k=2)
+        second = GoTRepeat("r2", config, Sorter("s2", LLMConfig("model-b", temperature=0)), k=2)
+        third = GoTRepeat("r3", LLMConfig("other", temperature=0),
+                          Sorter("s3", LLMConfig("model-a", temperature=0)), k=2)
+
+        self.assertFalse(first.can_batch_with(second))
+        self.assertTrue(first.can_batch_with(third))
+
+
+if __name__ == "__main__":
+    unittest.main()
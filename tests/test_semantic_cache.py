@@ -0,0 +1,81 @@
+import unittest
+from typing import Dict
+
+import numpy as np
+
+from examples.decontextualization.semantic_cache import SemanticCache
+
+
+class FixedEmbeddingCache(SemanticCache):
+    """SemanticCache con embedding predefiniti, senza modello di embedding"""
+
+    def __init__(self, embeddings: Dict[str, np.ndarray]):
+        super().__init__(":memory:")
+        self._embeddings = embeddings
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self._embeddings[text], dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+
+class SemanticCacheTest(unittest.TestCase):
+    CONTEXT = "My name is Maria. I am a professional caregiver."
+
+    def setUp(self):
+        self.cache = FixedEmbeddingCache({
+            "I am a caregiver.": np.array([1.0, 0.0]),
+            "I am a nurse.": np.array([1.0, 0.0]),
+            # Similarità coseno 0.84 con le frasi precedenti
+            "My name is Maria.": np.array([0.84, np.sqrt(1 - 0.84 ** 2)]),
+        })
+        self.values = {"in_context_sentence": "I am a caregiver.",
+                       "standalone_sentence": "Maria is a caregiver."}
+        self.cache.insert("I am a caregiver.", self.CONTEXT, self.values)
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_similar_sentence_in_same_context_hits(self):
+        values, _ = self.cache.lookup("I am a nurse.", self.CONTEXT)
+
+        self.assertEqual(values, {"in_context_sentence": "I am a nurse.",
+                                  "standalone_sentence": "Maria is a caregiver."})
+
+    def test_dissimilar_sentence_in_same_context_misses(self):
+        values, _ = self.cache.lookup("My name is Maria.", self.CONTEXT)
+        self.assertIsNone(values)
+
+    def test_different_context_misses(self):
+        values, _ = self.cache.lookup("I am a caregiver.", "Another interview.")
+        self.assertIsNone(values)
+
+    def test_hit_returns_a_copy(self):
+        values, _ = self.cache.lookup("I am a caregiver.", self.CONTEXT)
+        values["standalone_sentence"] = "changed"
+        self.values["standalone_sentence"] = "changed"
+
+        values, _ = self.cache.lookup("I am a caregiver.", self.CONTEXT)
+        self.assertEqual(values["standalone_sentence"], "Maria is a caregiver.")
+
+
+class EntryLimitTest(unittest.TestCase):
+
+    def test_oldest_entry_is_replaced_when_context_is_full(self):
+        embeddings = {f"sentence {i}": np.eye(40)[i] for i in range(40)}
+        cache = FixedEmbeddingCache(embeddings)
+        cache.max_entries_per_context = 32
+
+        for i in range(40):
+            cache.insert(f"sentence {i}", "context", {"standalone_sentence": str(i)})
+
+        first, _ = cache.lookup("sentence 0", "context")
+        last, _ = cache.lookup("sentence 39", "context")
+        kept, _ = cache.lookup("sentence 8", "context")
+        self.assertIsNone(first)
+        self.assertEqual(last["standalone_sentence"], "39")
+        self.assertEqual(kept["standalone_sentence"], "8")
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()